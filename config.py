@@ -1,15 +1,98 @@
+from os import environ
 from json import load
 
+
+__all__ = ["config", "reload_config"]
+
+_config_path = environ.get("LOG_SERVER_CONFIG", "files/config.json")
+
 config = {
     "local_log_file": "files/local.log",
     "dedicated_log_file": "files/dedicated.sqlite",
+    "dedicated_log_sharding": "none",
+    "dedicated_log_shards": 4,
+    "dedicated_log_max_shards": 64,
     
     "dedicated_log_storage_period": 10,
+    "dedicated_log_archive": True,
+    "dedicated_log_archive_directory": "files/archive",
+    "dedicated_log_archive_block_size": 262144,
+    "dedicated_log_templates": True,
+    "dedicated_log_template_depth": 4,
+    "dedicated_log_template_similarity": 0.4,
 
     "host": "127.0.0.1",
     "port": 64000,
+    "receive_buffer_size": 4194304,
+    "receive_batch_size": 64,
+    "max_datagram_size": 65507,
+    "drop_report_interval": 10.0,
+
+    "relay_accept": False,
+    "relay_enabled": False,
+    "relay_host": "127.0.0.1",
+    "relay_port": 64001,
+    "relay_store_locally": True,
+    "relay_batch_size": 500,
+    "relay_buffer_size": 100000,
+    "relay_retry_delay": 1.0,
+    "relay_timeout": 10.0,
+
+    "profiler_enabled": False,
+    "profiler_interval": 0.005,
+    "profiler_directory": "files/profiles",
+
     "debug": True
 }
 
-with open("files/config.json") as handle:
-    config = load(handle)
\ No newline at end of file
+# Allows running several servers from the same directory, for example a relay and its upstream server.
+# The file is merged over the defaults, so files written before a key was added keep working.
+
+with open(_config_path) as handle:
+    config.update(load(handle))
+
+
+# Keys only applied at startup, changing them on a running server would mix the old and new storage layout or sockets.
+
+_startup_keys = [
+    "local_log_file",
+    "dedicated_log_file",
+    "dedicated_log_sharding",
+    "dedicated_log_shards",
+    "dedicated_log_max_shards",
+    "dedicated_log_templates",
+    "host",
+    "port",
+    "receive_buffer_size",
+    "receive_batch_size",
+    "max_datagram_size",
+    "relay_accept",
+    "relay_enabled",
+    "relay_store_locally",
+    "relay_buffer_size",
+    "debug"
+]
+
+
+def reload_config() -> list[str]:
+    """
+        Reads the configuration file again, updating the config dictionary in place.
+
+        Keys only applied at startup, like the host, port and the storage layout, keep their current value.
+
+        :return The startup keys whose value changed in the file, they only take effect after a restart:
+
+        :raises OSError: If the configuration file cannot be read.
+        :raises ValueError: If the configuration file is not valid json.
+    """
+    with open(_config_path) as handle:
+        loaded = load(handle)
+
+    ignored = [key for key in _startup_keys if key in loaded and loaded[key] != config[key]]
+
+    for key in _startup_keys:
+        loaded.pop(key, None)
+
+    config.update(loaded)
+
+    return ignored
@@ -19,28 +19,31 @@ _log_local_file = "log.log"
 _log_local_encoding = "utf-8"
 
 _log_remote = False
-_log_remote_host = "127.0.0.1"
-_log_remote_port = "64000"
+_log_remote_servers: list["RemoteServer"] = []
+_log_remote_distribution = "failover"
+_log_remote_refresh = 300.0
+_log_remote_retry_delay = 5.0
+_log_remote_next = 0
 
 _trace_min_level = 3
 
 _log_configured = False
 _log_queue: Queue["LogEntry"] = Queue()
 _log_thread_event = Event()
+_log_shutdown_sentinel = object()
+_log_thread: "Thread|None" = None
 
 
 def _logger_thread():
     try:
         from queue import Empty as QueueEmptyError
         from socket import socket as Socket
-        from threading import main_thread
         from _io import TextIOWrapper
 
         global _log_local, _log_remote
 
 
         local_handle: TextIOWrapper|None = None
-        remote_handle: Socket|None = None
 
 
         if _log_local:
@@ -57,18 +60,29 @@ def _logger_thread():
 
             
             try:
-                remote_handle = Socket(AF_INET, SOCK_DGRAM)
+                for server in _log_remote_servers:
+                    server["handle"] = Socket(AF_INET, SOCK_DGRAM)
             except OSError:
                 error("Unable to create a socket for remote logging. Disabling remote log.")
 
-                remote_handle = None
                 _log_remote = False
         
         _log_thread_event.set()
 
+        stopping = False
+
         while True:
             try:
-                _entry = _log_queue.get(timeout = 1)
+                # Blocks until an entry arrives, without waking up in between.
+
+                _entry = _log_queue.get(block = not stopping)
+
+                if _entry is _log_shutdown_sentinel:
+                    # Keep saving the logs added while shutting down before exiting.
+
+                    stopping = True
+                    continue
+
                 entry = _entry["entry"]
 
                 text_log = None
@@ -97,7 +111,7 @@ def _logger_thread():
                         local_handle = None
                         _log_local = False
                 
-                if _log_remote and remote_handle is not None and _entry["send_remote"]:
+                if _log_remote and _entry["send_remote"]:
                     from json import dumps
 
 
@@ -114,21 +128,90 @@ def _logger_thread():
                     try:
                         str_packet = dumps(packet, separators=(",", ":"))
 
-                        remote_handle.sendto(str_packet.encode(), (_log_remote_host, _log_remote_port))
+                        _send_remote(str_packet.encode(), entry["context"])
                     except IOError as exception:
                         error("Unable to send remote log", exception, send_remote=False)
                 
                 
             except QueueEmptyError:
-                pass
-            finally:
-                # Exit if the main thread is dead and the log queue is empty, otherwise continue saving logs before exiting.
+                # Only raised after the shutdown request, once the log queue is empty.
 
-                if not main_thread().is_alive() and _log_queue.qsize() == 0:
-                    break
+                break
     finally:
         _log_thread_event.set()
 
+def _connect_remote_server(server: "RemoteServer"):
+    """
+        Resolves the address of the server and connects its socket to it.
+
+        The socket is only connected again if the address changed.
+    """
+    from socket import getaddrinfo, AF_INET, SOCK_DGRAM
+    from time import monotonic
+
+
+    address = getaddrinfo(server["host"], server["port"], AF_INET, SOCK_DGRAM)[0][4]
+
+    server["resolved_at"] = monotonic()
+
+    if address != server["address"]:
+        server["handle"].connect(address)
+        server["address"] = address
+
+def _remote_server_order(context: str) -> list["RemoteServer"]:
+    """Gets the servers to try for an entry, in order. Servers recently failing are only tried last."""
+    from time import monotonic
+    from zlib import crc32
+
+    global _log_remote_next
+
+
+    now = monotonic()
+    healthy = [server for server in _log_remote_servers if server["down_until"] <= now]
+    failing = [server for server in _log_remote_servers if server["down_until"] > now]
+
+    if healthy and _log_remote_distribution != "failover":
+        if _log_remote_distribution == "round_robin":
+            start = _log_remote_next % len(healthy)
+            _log_remote_next += 1
+        else:
+            # The entries of a context keep going to the same server while it is healthy.
+
+            start = crc32(context.encode()) % len(healthy)
+
+        healthy = healthy[start:] + healthy[:start]
+
+    return healthy + failing
+
+def _send_remote(packet: bytes, context: str):
+    """
+        Sends the packet to the first remote server accepting it.
+
+        A connected socket reports the icmp errors caused by the previous packets,
+        the server is then considered failing for _log_remote_retry_delay seconds.
+
+        :raises OSError: If the packet could not be sent to any server.
+    """
+    from time import monotonic
+
+
+    last_exception: OSError|None = None
+
+    for server in _remote_server_order(context):
+        try:
+            if server["address"] is None or monotonic() - server["resolved_at"] >= _log_remote_refresh:
+                _connect_remote_server(server)
+
+            server["handle"].send(packet)
+            server["down_until"] = 0.0
+
+            return
+        except OSError as exception:
+            last_exception = exception
+            server["down_until"] = monotonic() + _log_remote_retry_delay
+
+    raise last_exception or OSError("No remote log server configured.")
+
 def _get_log_text(log_entry: "LogEntry"):
     from os.path import basename
 
@@ -176,6 +259,14 @@ class LogEntry(TypedDict):
     context: str
     time: str
 
+class RemoteServer(TypedDict):
+    host: str
+    port: int
+    handle: "Socket|None"
+    address: tuple[str, int]|None
+    resolved_at: float
+    down_until: float
+
 class RemoteLogEntry(TypedDict):
     time: str
     level: int
@@ -325,6 +416,10 @@ def configure_logger(
         log_remote: bool = False,
         log_remote_host: str = "127.0.0.1",
         log_remote_port: int = 64000,
+        log_remote_servers: list[tuple[str, int]]|None = None,
+        log_remote_distribution: str = "failover",
+        log_remote_refresh: float = 300.0,
+        log_remote_retry_delay: float = 5.0,
         app_name: str = "DEFAULT",
         trace_min_level: int = 3,
         debug: bool = False
@@ -339,20 +434,26 @@ def configure_logger(
         :param log_remote: Set to True to send logs to a remote network log server.
         :param log_remote_host: The IP address or hostname of the remote log server. Only used if log_remote is True.
         :param log_remote_port: The network port of the remote log server. Only used if log_remote is True.
+        :param log_remote_servers: The (host, port) pairs of several remote log servers, replacing log_remote_host and log_remote_port.
+        :param log_remote_distribution: How logs are spread over the remote log servers: "failover" sends to the first healthy server,
+        "round_robin" rotates over the healthy servers and "context" picks a healthy server by the hash of the log context.
+        :param log_remote_refresh: The number of seconds after which the remote server hostnames are resolved again.
+        :param log_remote_retry_delay: The number of seconds a failing remote server is only used as a last resort.
         :param app_name: The app name that will be sent to the log server. Only used if log_remote is True.
         :param trace_min_level: The minimum log level on which the trace will be displayed in the console and local log. The trace will be saved for all remote logs.
         :param debug: If set to true, debug logs will be enabled.
 
         :raises PermissionError: If the log_local_file is not writable.
-        :raises ValueError: If the log_remote_host or the log_remote_port is invalid.
+        :raises ValueError: If a remote log host, port or the log_remote_distribution is invalid, or if log_remote_servers is empty.
         :raises RuntimeError: If this function is called again after configuring the logger.
     """
     from threading import Thread
+    from atexit import register
     
-    global _log_configured, _debug
+    global _log_configured, _debug, _log_thread
     global _log_stdout, _trace_min_level, _app_name
     global _log_local, _log_local_file, _log_local_encoding
-    global _log_remote, _log_remote_host, _log_remote_port
+    global _log_remote, _log_remote_servers, _log_remote_distribution, _log_remote_refresh, _log_remote_retry_delay
 
 
     if _log_configured:
@@ -369,9 +470,17 @@ def configure_logger(
     _log_local_file = log_local_file
     _log_local_encoding = log_local_encoding
 
+    if log_remote_servers is None:
+        log_remote_servers = [(log_remote_host, log_remote_port)]
+
     _log_remote = log_remote
-    _log_remote_host = log_remote_host
-    _log_remote_port = log_remote_port
+    _log_remote_distribution = log_remote_distribution
+    _log_remote_refresh = log_remote_refresh
+    _log_remote_retry_delay = log_remote_retry_delay
+    _log_remote_servers = [
+        {"host": host, "port": port, "handle": None, "address": None, "resolved_at": 0.0, "down_until": 0.0}
+        for host, port in log_remote_servers
+    ]
 
     if log_local:
         try:
@@ -381,17 +490,44 @@ def configure_logger(
             raise PermissionError("Access denied to local log file.")
     
     
-    if _log_remote_port > 65535:
-        raise ValueError("Remote log port is not in the range [0 - 65535].")
-    
-    if not _is_valid_ipv4(log_remote_host) and not _is_valid_domain(log_remote_host):
-        raise ValueError("Remote log host is not a valid ipv4 address or the domain cannot be resolved.")
+    if log_remote_distribution not in ("failover", "round_robin", "context"):
+        raise ValueError("Remote log distribution is not one of \"failover\", \"round_robin\" or \"context\".")
 
+    if not log_remote_servers:
+        raise ValueError("Remote log servers list is empty.")
 
-    Thread(target=_logger_thread, name="Logger Thread", daemon=False).start()
+    for host, port in log_remote_servers:
+        if port > 65535:
+            raise ValueError("Remote log port is not in the range [0 - 65535].")
+        
+        if not _is_valid_ipv4(host) and not _is_valid_domain(host):
+            raise ValueError("Remote log host is not a valid ipv4 address or the domain cannot be resolved.")
+
+
+    # The thread is a daemon so the interpreter can reach the exit handlers, which save the remaining logs.
+
+    register(shutdown)
+
+    _log_thread = Thread(target=_logger_thread, name="Logger Thread", daemon=True)
+    _log_thread.start()
 
     _log_thread_event.wait()
 
+def shutdown():
+    """
+        Saves the remaining logs and stops the logging thread.
+
+        Called automatically at exit. Logs added afterwards are ignored.
+    """
+    from threading import current_thread
+
+
+    if _log_thread is None or not _log_thread.is_alive() or _log_thread is current_thread():
+        return
+
+    _log_queue.put(_log_shutdown_sentinel)
+    _log_thread.join()
+
 #region logging
 
 def debug(message: str, exception: Exception|None = None, send_remote=True):
@@ -0,0 +1,266 @@
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, TypedDict
+from threading import Lock
+from config import *
+
+
+#region private
+
+#region types
+
+class IndexEntry(TypedDict):
+    offset: int
+    length: int
+    count: int
+    start: str
+    end: str
+
+#endregion
+
+_time_formats = ["%d.%m.%Y %H:%M:%S", "%Y-%m-%d %H:%M:%S"]
+
+# Shards share the daily segments, only one export may append to them at a time.
+
+_export_lock = Lock()
+
+
+def _segment_paths(day: str) -> tuple[str, str]:
+    """Gets the data and index file paths of the archive segment for the provided day."""
+    from os.path import join
+
+
+    directory = config["dedicated_log_archive_directory"]
+
+    return join(directory, f"{day}.ndjson.gz"), join(directory, f"{day}.index.ndjson")
+
+def _read_index(index_path: str, repair: bool = False) -> list[IndexEntry]:
+    """
+        Reads the index entries of a segment.
+
+        An export interrupted while writing the index can leave a partial last line.
+        It is skipped, and removed from the file if repair is set, so its block is dropped too.
+    """
+    from os.path import getsize
+    from json import loads
+
+
+    index: list[IndexEntry] = []
+    valid_size = 0
+
+    try:
+        with open(index_path, "rb") as handle:
+            for line in handle:
+                if not line.endswith(b"\n"):
+                    break
+
+                try:
+                    if line.strip():
+                        index.append(loads(line))
+                except ValueError:
+                    break
+
+                valid_size += len(line)
+    except FileNotFoundError:
+        return []
+
+    if repair and valid_size < getsize(index_path):
+        with open(index_path, "r+b") as handle:
+            handle.truncate(valid_size)
+
+    return index
+
+class _SegmentWriter:
+    """
+        Appends rows of a single day to its archive segment.
+
+        Rows are buffered and written as independently compressed gzip members,
+        so the segment remains a valid gzip file while every block can be
+        decompressed on its own using the offsets from the sidecar index.
+    """
+
+    def __init__(self, day: str):
+        self._data_path, self._index_path = _segment_paths(day)
+        self._lines: list[bytes] = []
+        self._size = 0
+        self._start: datetime|None = None
+        self._end: datetime|None = None
+
+        # Drops any block left without an index entry by an interrupted export.
+
+        index = _read_index(self._index_path, repair=True)
+        self._offset = index[-1]["offset"] + index[-1]["length"] if index else 0
+
+        self._data_handle = open(self._data_path, "ab")
+        self._data_handle.truncate(self._offset)
+        self._index_handle = open(self._index_path, "a", encoding="utf-8")
+
+    def write(self, row: dict, time: datetime):
+        from json import dumps
+
+
+        line = dumps(row, separators=(",", ":")).encode() + b"\n"
+
+        self._lines.append(line)
+        self._size += len(line)
+        self._start = time if self._start is None else min(self._start, time)
+        self._end = time if self._end is None else max(self._end, time)
+
+        if self._size >= config["dedicated_log_archive_block_size"]:
+            self.flush()
+
+    def flush(self):
+        from gzip import compress
+        from json import dumps
+        from os import fsync
+
+
+        if not self._lines:
+            return
+
+        block = compress(b"".join(self._lines))
+
+        self._data_handle.write(block)
+        self._data_handle.flush()
+        fsync(self._data_handle.fileno())
+
+        # The index entry is only written once its block is safely on disk.
+
+        index_entry: IndexEntry = {
+            "offset": self._offset,
+            "length": len(block),
+            "count": len(self._lines),
+            "start": self._start.isoformat(sep=" "),
+            "end": self._end.isoformat(sep=" ")
+        }
+
+        self._index_handle.write(dumps(index_entry, separators=(",", ":")) + "\n")
+        self._index_handle.flush()
+        fsync(self._index_handle.fileno())
+
+        self._offset += len(block)
+        self._lines = []
+        self._size = 0
+        self._start = None
+        self._end = None
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._data_handle.close()
+            self._index_handle.close()
+
+#endregion
+
+#region public
+
+def parse_time(text: str) -> datetime|None:
+    """
+        Parses a log entry time, as sent by the logger or as stored by sqlite.
+
+        :return The parsed time or None if the format is not recognized:
+    """
+    for time_format in _time_formats:
+        try:
+            return datetime.strptime(text, time_format)
+        except (TypeError, ValueError):
+            pass
+
+    return None
+
+def export(rows: Iterable[dict]) -> int:
+    """
+        Streams the provided log rows into the daily archive segments.
+
+        Rows are grouped by the day of their time and the trace column is decoded,
+        so every archived line is a self contained json object.
+
+        :param rows: The log rows, as dictionaries with the logs table columns.
+
+        :return The number of archived rows:
+
+        :raises OSError: If the archive files cannot be written.
+    """
+    from os import makedirs
+    from json import loads
+
+
+    makedirs(config["dedicated_log_archive_directory"], exist_ok=True)
+
+    writers: dict[str, _SegmentWriter] = {}
+    count = 0
+
+    with _export_lock:
+        try:
+            for row in rows:
+                time = parse_time(row["time"]) or datetime.now().replace(microsecond=0)
+                day = time.strftime("%Y-%m-%d")
+
+                try:
+                    row["trace"] = loads(row["trace"]) if row["trace"] else []
+                except ValueError:
+                    pass
+
+                if day not in writers:
+                    writers[day] = _SegmentWriter(day)
+
+                writers[day].write(row, time)
+                count += 1
+        finally:
+            for writer in writers.values():
+                writer.close()
+
+    return count
+
+def query(start: datetime, end: datetime) -> Iterator[dict]:
+    """
+        Reads the archived log rows with the time in the provided range.
+
+        Only the blocks overlapping the range are read and decompressed.
+
+        :param start: The start of the range, inclusive.
+        :param end: The end of the range, inclusive.
+
+        :return An iterator over the archived rows, ordered by segment and block:
+    """
+    from gzip import decompress
+    from json import loads
+
+
+    day = start.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    while day <= end:
+        data_path, index_path = _segment_paths(day.strftime("%Y-%m-%d"))
+        index = [
+            entry for entry in _read_index(index_path)
+            if datetime.fromisoformat(entry["start"]) <= end and datetime.fromisoformat(entry["end"]) >= start
+        ]
+
+        if index:
+            with open(data_path, "rb") as handle:
+                for entry in index:
+                    handle.seek(entry["offset"])
+
+                    for line in decompress(handle.read(entry["length"])).splitlines():
+                        row = loads(line)
+                        time = parse_time(row["time"])
+
+                        if time is None or start <= time <= end:
+                            yield row
+
+        day += timedelta(days=1)
+
+#endregion
+
+
+if __name__ == "__main__":
+    from json import dumps
+    from sys import argv
+
+
+    if len(argv) != 3:
+        print("Usage: python -m src.archive <start> <end>")
+        print("The times use the iso format, for example 2024-01-31T12:00:00.")
+    else:
+        for row in query(datetime.fromisoformat(argv[1]), datetime.fromisoformat(argv[2])):
+            print(dumps(row, separators=(",", ":")))
@@ -1,10 +1,14 @@
 from sqlite3 import Connection as SqliteConnection
+from time import perf_counter
 from queue import Queue, Empty as QueueEmptyError
-from threading import Event
-from typing import TypedDict
+from src.templates import TemplateMiner, render
+from src.scheduler import Scheduler
+import src.profiler as profiler
+import src.archive as archive
+from threading import Event, Lock, Thread
+from typing import Collection, Iterable, TypedDict
 from config import *
 from logger import *
-import schedule 
 
 
 log_context("Dedicated Logger")
@@ -43,14 +47,74 @@ _create_statement = """
         time text not null,
         level integer not null,
         source text not null,
-        message text not null,
+        message text,
         context text not null,
         app_name text not null,
         exception_message text,
-        trace text
+        trace text,
+        template_id integer references templates (id),
+        parameters text
     )
 """
 
+_create_templates_statement = """
+    create table if not exists templates (
+        id integer primary key autoincrement not null,
+        template text not null unique,
+        active integer not null default 1,
+        replaced_by integer references templates (id)
+    )
+"""
+
+_has_replaced_by_statement = """
+    select count(*) from pragma_table_info('templates') where name = 'replaced_by';
+"""
+
+_add_replaced_by_statement = """
+    alter table templates add column replaced_by integer references templates (id);
+"""
+
+_create_index_statement = """
+    create index if not exists logs_time_template on logs (time, template_id);
+"""
+
+_drop_index_statement = """
+    drop index if exists logs_time_template;
+"""
+
+_is_legacy_statement = """
+    select count(*) from pragma_table_info('logs') where name = 'template_id';
+"""
+
+# Rebuilds a logs table created before templates, its message column is not nullable.
+
+_migrate_script = """
+    begin;
+
+    alter table logs rename to logs_legacy;
+
+    create table logs (
+        id integer primary key autoincrement not null,
+        time text not null,
+        level integer not null,
+        source text not null,
+        message text,
+        context text not null,
+        app_name text not null,
+        exception_message text,
+        trace text,
+        template_id integer references templates (id),
+        parameters text
+    );
+
+    insert into logs (id, time, level, source, message, context, app_name, exception_message, trace)
+        select id, time, level, source, message, context, app_name, exception_message, trace from logs_legacy;
+
+    drop table logs_legacy;
+
+    commit;
+"""
+
 _insert_statement = """
     insert into logs (
         time,
@@ -60,7 +124,9 @@ _insert_statement = """
         context,
         app_name,
         exception_message,
-        trace
+        trace,
+        template_id,
+        parameters
     ) values (
         :time,
         :level,
@@ -69,108 +135,656 @@ _insert_statement = """
         :context,
         :app_name,
         :exception_message,
-        :trace
+        :trace,
+        :template_id,
+        :parameters
     );
 """
 
+_select_version_statement = """
+    pragma user_version;
+"""
+
+_set_version_statement = """
+    pragma user_version = 1;
+"""
+
+# Times used to be stored as sent by the logger, which cannot be compared as text.
+
+_convert_times_statement = """
+    update logs set time = substr(time, 7, 4) || '-' || substr(time, 4, 2) || '-' || substr(time, 1, 2) || substr(time, 11)
+        where time glob '[0-9][0-9].[0-9][0-9].[0-9][0-9][0-9][0-9] *';
+"""
+
+# Upserts and returning clauses need recent sqlite versions, a known template is only reactivated.
+
+_insert_template_statement = """
+    insert or ignore into templates (template) values (:template);
+"""
+
+_activate_template_statement = """
+    update templates set active = 1, replaced_by = null where template = :template;
+"""
+
+_select_template_id_statement = """
+    select id from templates where template = :template;
+"""
+
+# Rows keep the id of the template they were stored with, the replacement lets them be counted under the current one.
+
+_retire_template_statement = """
+    update templates set active = 0, replaced_by = :replaced_by where id = :id;
+"""
+
+_select_templates_statement = """
+    select id, template from templates where active = 1 order by id;
+"""
+
+_expiring_statement = """
+    select logs.*, templates.template from logs
+        left join templates on templates.id = logs.template_id
+        where logs.time < datetime('now', '-' || :days || ' days') and logs.id > :archived_id
+        order by logs.id;
+"""
+
+_last_expiring_statement = """
+    select max(id) from logs where time < datetime('now', '-' || :days || ' days');
+"""
+
 _delete_statement = """
     delete from logs where time < datetime('now', '-' || :days || ' days');
 """
 
 #endregion
 
-_log_start = Event()
-_log_queue: Queue[LogEntry] = Queue()
-_connection: SqliteConnection = None
+class _Shard:
+    """The database file, the queue and the writer thread state of a storage shard."""
+
+    def __init__(self, name: str|None):
+        self.name = name
+        self.database = shard_database(name)
+        self.queue: Queue[LogEntry] = Queue()
+        self.started = Event()
+        self.scheduler = Scheduler()
+        self.connection: SqliteConnection|None = None
+        self.commit_pending = False
+        self.thread: Thread|None = None
+
+_shutdown_sentinel = object()
+_shards: dict[str|None, _Shard] = {}
+_app_shards: dict[str, _Shard] = {}
+_shards_lock = Lock()
+_stopping = False
+_database_lock = None
+
+
+def _hash_shard_name(app_name: str) -> str:
+    from zlib import crc32
+
+
+    # A stable hash, the builtin one changes between runs.
+
+    return f"hash-{crc32(app_name.encode()) % config['dedicated_log_shards']}"
+
+def _shard_name(app_name: str, existing: Collection[str|None]) -> str|None:
+    """
+        Gets the name of the shard storing the entries of the provided app.
 
+        Names are lower case, so they map to distinct files on case insensitive file systems.
+        Once dedicated_log_max_shards app shards exist, the entries of new apps go to the hash shards.
 
-def _commit():
+        :param existing: The names of the existing shards.
+
+        :return The shard name or None if sharding is disabled:
+    """
+    from re import sub
+
+
+    sharding = config["dedicated_log_sharding"]
+
+    if sharding == "app_name":
+        name = "app-" + (sub(r"[^a-z0-9_-]", "_", app_name.lower()) or "_")
+
+        if name in existing:
+            return name
+
+        app_shards = sum(1 for existing_name in existing if existing_name is not None and existing_name.startswith("app-"))
+
+        return name if app_shards < config["dedicated_log_max_shards"] else _hash_shard_name(app_name)
+
+    if sharding == "hash":
+        return _hash_shard_name(app_name)
+
+    return None
+
+def _is_shard_name(name: str) -> bool:
+    """Checks if the shard name is one the current sharding mode produces."""
+    from re import fullmatch
+
+
+    sharding = config["dedicated_log_sharding"]
+    match = fullmatch(r"hash-(\d+)", name)
+
+    if match is not None:
+        return sharding in ("app_name", "hash") and int(match[1]) < config["dedicated_log_shards"]
+
+    return sharding == "app_name" and fullmatch(r"app-[a-z0-9_-]+", name) is not None
+
+def _existing_shard_names() -> list[str]:
+    """Gets the names of the shards with a database file, produced by the current sharding mode."""
+    from os.path import basename, splitext
+    from glob import glob, escape
+
+
+    root, extension = splitext(config["dedicated_log_file"])
+    prefix = basename(root) + "."
+    names = [
+        basename(database)[len(prefix):len(basename(database)) - len(extension)]
+        for database in glob(f"{escape(root)}.*{escape(extension)}")
+    ]
+
+    return sorted(name for name in names if _is_shard_name(name))
+
+def _lock_database(database: str):
+    """
+        Takes the lock held on a database by the log server while it runs, or by a bulk insert.
+
+        The lock covers every shard of the database. It is released once the returned file is closed.
+
+        :return The lock file or None if file locks are not supported on this platform:
+
+        :raises RuntimeError: If the database is already locked by another process.
+    """
+    try:
+        from fcntl import flock, LOCK_EX, LOCK_NB
+    except ImportError:
+        return None
+
+
+    handle = open(database + ".lock", "a")
+
+    try:
+        flock(handle, LOCK_EX | LOCK_NB)
+    except BlockingIOError:
+        handle.close()
+
+        raise RuntimeError(f"The database {database} is in use by a running log server or import.")
+
+    return handle
+
+def _start_shard(name: str|None) -> _Shard:
+    """Creates a shard and starts its writer thread. The shards lock must be held."""
+
+
+    shard = _Shard(name)
+    _shards[name] = shard
+
+    thread_name = "Log Server" if name is None else f"Log Server {name}"
+
+    shard.thread = Thread(target=_thread, args=(shard,), name=thread_name, daemon=False)
+    shard.thread.start()
+
+    shard.started.wait()
+
+    # A shard created while shutting down still has to exit once its queue is empty.
+
+    if _stopping:
+        shard.queue.put(_shutdown_sentinel)
+
+    return shard
+
+def _get_shard(app_name: str) -> _Shard:
+    shard = _app_shards.get(app_name)
+
+    if shard is not None:
+        return shard
+
+    with _shards_lock:
+        name = _shard_name(app_name, _shards)
+        shard = _shards.get(name) or _start_shard(name)
+        _app_shards[app_name] = shard
+
+    return shard
+
+def _commit(shard: _Shard) -> bool:
+    """
+        Commits the pending writes of the shard.
+
+        :return True if the commit succeeded:
+    """
     debug("Commiting to database.")
 
+    shard.commit_pending = False
+
     try:
-        _connection.commit()
+        started = perf_counter()
+
+        shard.connection.commit()
+
+        if profiler.enabled:
+            profiler.record("commit", perf_counter() - started)
     except Exception as exception:
         error("Unable to commit to database", exception)
+        return False
+
+    return True
+
+def _archived_id_path(shard: _Shard) -> str:
+    return shard.database + ".archived"
+
+def _read_archived_id(shard: _Shard) -> int:
+    """
+        Reads the id of the last archived row whose deletion may not have been committed.
+
+        :return The row id or 0 if the last deletion was committed:
+    """
+    try:
+        with open(_archived_id_path(shard), encoding="ascii") as handle:
+            return int(handle.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+def _write_archived_id(shard: _Shard, archived_id: int):
+    from os import fsync
+
+
+    with open(_archived_id_path(shard), "w", encoding="ascii") as handle:
+        handle.write(str(archived_id))
+        handle.flush()
+        fsync(handle.fileno())
+
+def _convert_times(connection: SqliteConnection):
+    """Converts the times stored before the iso format was used, once per database."""
+
+
+    if connection.execute(_select_version_statement).fetchone()[0] >= 1:
+        return
+
+    info("Converting the stored log times to the iso format.")
+
+    connection.execute(_convert_times_statement)
+    connection.execute(_set_version_statement)
+    connection.commit()
+
+def _expiring_rows(columns: list[str], cursor):
+    """Renders the templated messages back, so the archived rows keep the original format."""
+    from json import loads
 
-def _periodic_deletion():
+
+    for values in cursor:
+        row = dict(zip(columns, values))
+        template = row.pop("template")
+        parameters = row.pop("parameters")
+
+        del row["template_id"]
+
+        if template is not None:
+            row["message"] = render(template, loads(parameters))
+
+        yield row
+
+def _store_template(connection: SqliteConnection, template: str, replaced_id: int|None) -> int:
+    parameters = {"template": template}
+
+    connection.execute(_insert_template_statement, parameters)
+    connection.execute(_activate_template_statement, parameters)
+
+    template_id = connection.execute(_select_template_id_statement, parameters).fetchone()[0]
+
+    if replaced_id is not None:
+        connection.execute(_retire_template_statement, {"id": replaced_id, "replaced_by": template_id})
+
+    return template_id
+
+def _create_schema(connection: SqliteConnection) -> TemplateMiner|None:
+    """
+        Creates or migrates the tables and loads the stored templates.
+
+        :return The template miner, or None if templates are disabled:
+    """
+    try:
+        connection.execute(_create_templates_statement)
+        connection.execute(_create_statement)
+
+        if connection.execute(_has_replaced_by_statement).fetchone()[0] == 0:
+            connection.execute(_add_replaced_by_statement)
+
+        if connection.execute(_is_legacy_statement).fetchone()[0] == 0:
+            info("Migrating the logs table to support message templates.")
+
+            connection.executescript(_migrate_script)
+
+        _convert_times(connection)
+
+        connection.execute(_create_index_statement)
+    except Exception as exception:
+        warn("Unable to execute table create statement", exception)
+
+    if not config["dedicated_log_templates"]:
+        return None
+
+    miner = TemplateMiner(
+        lambda template, replaced_id: _store_template(connection, template, replaced_id),
+        depth=config["dedicated_log_template_depth"],
+        similarity=config["dedicated_log_template_similarity"]
+    )
+
+    try:
+        for template_id, template in connection.execute(_select_templates_statement):
+            miner.load(template_id, template)
+    except Exception as exception:
+        warn("Unable to load the stored templates", exception)
+
+    return miner
+
+def _prepare_entry(entry: LogEntry, miner: TemplateMiner|None):
+    """Converts a log entry to the parameters of the insert statement, in place."""
+    from json import dumps
+
+
+    entry["trace"] = dumps(entry["trace"], separators=(",", ":"))
+    entry["template_id"] = None
+    entry["parameters"] = None
+
+    # Stored in the iso format, so time ranges can be compared as text.
+
+    time = archive.parse_time(entry["time"])
+
+    if time is not None:
+        entry["time"] = time.strftime("%Y-%m-%d %H:%M:%S")
+
+    if miner is not None and isinstance(entry["message"], str):
+        entry["template_id"], parameters = miner.add(entry["message"])
+        entry["parameters"] = dumps(parameters, separators=(",", ":"))
+        entry["message"] = None
+
+def _periodic_deletion(shard: _Shard):
     debug("Performing periodic deletion.")
 
+    from os import remove
+
+
+    parameters = {"days": config["dedicated_log_storage_period"]}
+    archived = False
+
+    if config["dedicated_log_archive"]:
+        try:
+            # Rows archived before a crash that prevented their deletion from being committed are not archived again.
+
+            parameters["archived_id"] = _read_archived_id(shard)
+            last_id = shard.connection.execute(_last_expiring_statement, parameters).fetchone()[0]
+
+            cursor = shard.connection.execute(_expiring_statement, parameters)
+            columns = [column[0] for column in cursor.description]
+
+            count = archive.export(_expiring_rows(columns, cursor))
+
+            if last_id is not None and last_id > parameters["archived_id"]:
+                _write_archived_id(shard, last_id)
+                archived = True
+
+            debug(f"Archived {count} expiring log entries.")
+        except Exception as exception:
+            # The rows are kept until they can be archived.
+
+            error("Unable to archive expiring log entries", exception)
+            return
+
     try:
-        _connection.execute(_delete_statement, {"days": config["dedicated_log_storage_period"]})
+        shard.connection.execute(_delete_statement, parameters)
+        deleted = True
     except Exception as exception:
         error("Unable to perform deletion maintenance", exception)
+        deleted = False
+
+    # Commits are otherwise only scheduled after inserts, an idle server must not keep the write lock.
 
-def _thread():
+    committed = _commit(shard)
+
+    # Once the deletion is committed, the archived rows are gone and the recorded id is not needed anymore.
+
+    if committed and deleted and (archived or parameters.get("archived_id")):
+        try:
+            remove(_archived_id_path(shard))
+        except OSError:
+            pass
+
+def _thread(shard: _Shard):
     try:
         from sqlite3 import connect as sqlite
-        from threading import main_thread
-        from json import dumps
-        
-        global _connection
         
 
-        _connection = sqlite(config["dedicated_log_file"])
+        shard.connection = sqlite(shard.database)
 
-        try:
-            _connection.execute(_create_statement)
-        except Exception as exception:
-            warn("Unable to execute table create statement", exception)
+        miner = _create_schema(shard.connection)
         
-        schedule.every().day.at("03:50").do(_periodic_deletion)
-        schedule.every().second.do(_commit)
+        shard.scheduler.daily_at("03:50", lambda: _periodic_deletion(shard))
+
+        shard.started.set()
 
-        _log_start.set()
+        _periodic_deletion(shard)
 
-        _periodic_deletion()
+        stopping = False
         
         while True:
             try:
-                entry = _log_queue.get(timeout = 0.25)
+                # Sleeps until the next entry or the next scheduled task, whichever comes first.
+
+                entry = shard.queue.get(block = not stopping, timeout = shard.scheduler.timeout())
+            except QueueEmptyError:
+                # Exit the thread if all logs have been saved after the shutdown request.
+
+                if stopping:
+                    break
+
+                entry = None
+            
+            if entry is _shutdown_sentinel:
+                stopping = True
+            elif entry is not None:
+                enqueued = entry.pop("_profile_enqueued", None)
+
+                if enqueued is not None and profiler.enabled:
+                    profiler.record("queue", perf_counter() - enqueued)
 
                 debug("Recieved log entry")
                 debug(str(entry))
 
-                entry["trace"] = dumps(entry["trace"], separators=(",", ":"))
-
                 try:
-                    _connection.execute(_insert_statement, entry)
+                    inserting = perf_counter()
+
+                    _prepare_entry(entry, miner)
+
+                    shard.connection.execute(_insert_statement, entry)
+
+                    if profiler.enabled:
+                        profiler.record("insert", perf_counter() - inserting)
                 except Exception as exception:
                     warn("Unable to write log entry to database", exception)
-            except QueueEmptyError:
-                pass
-            finally:
-                try:
-                    schedule.run_pending()
-                except Exception as exception:
-                    error("Error occured while running tasks", exception)
 
-                # Exit the thread if all logs have been saved and the main thread is dead.
+                # Commits are only scheduled while there are uncommitted writes.
 
-                if not main_thread().is_alive() and _log_queue.qsize() == 0:
-                    break
+                if not shard.commit_pending:
+                    shard.commit_pending = True
+                    shard.scheduler.call_later(1.0, lambda: _commit(shard))
+
+            try:
+                shard.scheduler.run_pending()
+            except Exception as exception:
+                error("Error occured while running tasks", exception)
     except Exception as exception:
         error("Thread died", exception)
     finally:
-        _log_start.set()
-        _commit()
+        shard.started.set()
+
+        if shard.connection is not None:
+            _commit(shard)
 
 #endregion
 
 #region public
 
+def shard_database(name: str|None) -> str:
+    """
+        Gets the database file of a shard.
+
+        :param name: The shard name or None if sharding is disabled.
+    """
+    from os.path import splitext
+
+
+    if name is None:
+        return config["dedicated_log_file"]
+
+    root, extension = splitext(config["dedicated_log_file"])
+
+    return f"{root}.{name}{extension}"
+
+def database_files() -> list[str]:
+    """
+        Gets the existing database files, of the unsharded storage and of every shard.
+
+        Only the shard names produced by the current sharding mode are matched,
+        so unrelated files next to the database are ignored.
+    """
+    from os.path import exists
+
+
+    files = [shard_database(name) for name in _existing_shard_names()]
+
+    if exists(config["dedicated_log_file"]):
+        files.insert(0, config["dedicated_log_file"])
+
+    return files
+
 def start():
-    """Starts the dedicated logger thread."""
-    from threading import Thread
-    
+    """
+        Starts the writer threads of the shards known at startup, the others are started on their first entry.
 
-    Thread(target=_thread, name="Log Server", daemon=False).start()
+        :raises RuntimeError: If the database is in use by another log server or by a bulk insert.
+    """
+    from os.path import exists
+
+    global _database_lock
     
-    _log_start.wait()
+
+    _database_lock = _lock_database(config["dedicated_log_file"])
+
+    sharding = config["dedicated_log_sharding"]
+
+    with _shards_lock:
+        if sharding == "hash":
+            names = [f"hash-{index}" for index in range(config["dedicated_log_shards"])]
+        elif sharding == "app_name":
+            # The existing shards are started so their retention keeps running.
+
+            names = _existing_shard_names()
+        else:
+            names = [None]
+
+        # The unsharded database left from before sharding gets no new entries, but it is still
+        # queried, so its rows still have to expire. Sharded modes never route entries to it.
+
+        if names != [None] and exists(config["dedicated_log_file"]):
+            names.append(None)
+
+        for name in names:
+            _start_shard(name)
+
+def shutdown():
+    """Makes the shard threads exit once their queues are empty and waits for them."""
+    global _stopping
+
+
+    with _shards_lock:
+        _stopping = True
+        shards = list(_shards.values())
+
+        for shard in shards:
+            shard.queue.put(_shutdown_sentinel)
+
+    for shard in shards:
+        shard.thread.join()
+
+    if _database_lock is not None:
+        _database_lock.close()
+
+def bulk_insert(batches: Iterable[list[LogEntry]], database: str|None = None) -> int:
+    """
+        Inserts batches of log entries directly into the databases, one transaction per batch and shard.
+
+        The time index is dropped while inserting and rebuilt afterwards, and the templates
+        are mined independently of the log server, so the databases must not be in use.
+        The lock taken by the log server is checked where file locks are supported.
+
+        :param batches: The log entries, in batches.
+        :param database: The database file, by default the entries are stored in their shards.
+
+        :return The number of inserted entries:
+
+        :raises RuntimeError: If the database is in use by a running log server.
+    """
+    from sqlite3 import connect as sqlite
+
+
+    connections: dict[str, tuple[SqliteConnection, TemplateMiner|None]] = {}
+    shard_names: set[str|None] = set(_existing_shard_names())
+    count = 0
+    lock = _lock_database(database or config["dedicated_log_file"])
+
+    try:
+        for batch in batches:
+            shard_batches: dict[str, list[LogEntry]] = {}
+
+            for entry in batch:
+                if database is None:
+                    name = _shard_name(str(entry.get("app_name", "")), shard_names)
+                    shard_names.add(name)
+
+                    target = shard_database(name)
+                else:
+                    target = database
+
+                shard_batches.setdefault(target, []).append(entry)
+
+            for target, shard_batch in shard_batches.items():
+                if target not in connections:
+                    connection = sqlite(target)
+                    connections[target] = (connection, _create_schema(connection))
+
+                    connection.execute(_drop_index_statement)
+                    connection.execute("pragma synchronous = off;")
+
+                connection, miner = connections[target]
+
+                for entry in shard_batch:
+                    _prepare_entry(entry, miner)
+
+                with connection:
+                    connection.executemany(_insert_statement, shard_batch)
+
+                count += len(shard_batch)
+    finally:
+        try:
+            for connection, _ in connections.values():
+                try:
+                    connection.execute(_create_index_statement)
+                    connection.commit()
+                finally:
+                    connection.close()
+        finally:
+            if lock is not None:
+                lock.close()
+
+    return count
 
 def add_entry(entry: LogEntry):
-    """Adds the provided log entry to the log queue."""
+    """Adds the provided log entry to the queue of its shard."""
+
 
+    if profiler.enabled:
+        entry["_profile_enqueued"] = perf_counter()
 
-    _log_queue.put(entry)
+    _get_shard(str(entry.get("app_name", ""))).queue.put(entry)
 
 #endregion
\ No newline at end of file
@@ -0,0 +1,283 @@
+from typing import Iterator
+from config import *
+
+
+#region private
+
+_levels = ["DEBUG", "INFO", "WARNING", "ERROR", "REALTIME"]
+
+# Files are split into chunks parsed in parallel, every chunk is inserted in its own transaction.
+
+_chunk_size = 8 * 1024 * 1024
+
+_header_pattern = r"^\[(?P<time>[^\]]*)\] \[(?P<context>[^\]]*)\] \[(?P<level>DEBUG|INFO|WARNING|ERROR|REALTIME)\]: (?P<message>.*)$"
+_exception_pattern = r"^(?P<message>.*?): \[(?P<exception_class>[A-Za-z_][\w.]*)\]: (?P<exception_message>.*)$"
+_frame_pattern = r"^    \[(?P<file>.*):(?P<line>\d+)\] (?P<text>.*)$"
+
+
+def _is_ndjson(path: str) -> bool:
+    """Detects the file format from its first non empty line."""
+
+
+    with open(path, encoding="utf-8", errors="replace") as handle:
+        for line in handle:
+            if line.strip():
+                return line.lstrip().startswith("{")
+
+    return False
+
+def _chunks(path: str) -> list[tuple[int, int]]:
+    from os.path import getsize
+
+
+    size = getsize(path)
+
+    return [(start, min(start + _chunk_size, size)) for start in range(0, max(size, 1), _chunk_size)]
+
+def _chunk_lines(path: str, start: int, end: int) -> Iterator[tuple[int, str]]:
+    """
+        Reads the lines of the file starting at or after the start offset, with their offsets.
+
+        Lines starting before the end offset are read whole, the following ones are
+        also read so the last entry of the chunk can be completed by the caller.
+    """
+    with open(path, "rb") as handle:
+        if start > 0:
+            # The line containing the start offset belongs to the previous chunk.
+
+            handle.seek(start - 1)
+            handle.readline()
+
+        offset = handle.tell()
+
+        for line in handle:
+            yield offset, line.decode("utf-8", errors="replace").rstrip("\r\n")
+
+            offset += len(line)
+
+def _parse_text_chunk(path: str, start: int, end: int, app_name: str, source: str) -> list[dict]:
+    """
+        Parses the entries written by the logger to a local log file, whose header line starts in the chunk.
+
+        The indented lines following a [TRACE]: line are reassembled into the trace frames,
+        other lines not starting an entry are appended to the message of the previous one.
+        The exception is split from the message once all of its lines are read.
+    """
+    from re import compile, DOTALL
+
+
+    header = compile(_header_pattern)
+    exception = compile(_exception_pattern, DOTALL)
+    frame = compile(_frame_pattern)
+
+    entries: list[dict] = []
+    entry: dict|None = None
+    in_trace = False
+
+    for offset, line in _chunk_lines(path, start, end):
+        match = header.match(line)
+
+        if match is not None:
+            if offset >= end:
+                break
+
+            entry = {
+                "time": match["time"],
+                "level": _levels.index(match["level"]),
+                "source": source,
+                "message": match["message"],
+                "context": match["context"],
+                "app_name": app_name,
+                "exception_message": "None",
+                "trace": []
+            }
+            in_trace = False
+
+            entries.append(entry)
+        elif entry is None:
+            # Lines before the first entry of the chunk belong to the previous chunk.
+
+            continue
+        elif line == "[TRACE]:":
+            in_trace = True
+        elif in_trace and (frame_match := frame.match(line)) is not None:
+            entry["trace"].append({"file": frame_match["file"], "line": int(frame_match["line"]), "text": frame_match["text"]})
+        else:
+            in_trace = False
+            entry["message"] += "\n" + line
+
+    # The exception follows the whole message, which can span several lines.
+
+    for entry in entries:
+        exception_match = exception.match(entry["message"])
+
+        if exception_match is not None:
+            entry["message"] = exception_match["message"]
+            entry["exception_message"] = exception_match["exception_message"]
+
+    return entries
+
+def _parse_level(level) -> int|None:
+    """
+        Parses a level name or number.
+
+        :return The level number or None if the level is not known:
+    """
+    if level in _levels:
+        return _levels.index(level)
+
+    if isinstance(level, bool):
+        return None
+
+    try:
+        number = int(level)
+    except (TypeError, ValueError):
+        return None
+
+    return number if 0 <= number < len(_levels) else None
+
+def _parse_ndjson_chunk(path: str, start: int, end: int, app_name: str, source: str) -> tuple[list[dict], int]:
+    """
+        Parses the json log entries, one per line, whose line starts in the chunk.
+
+        :return The entries and the number of skipped lines, invalid or with an unknown level:
+    """
+    from json import loads
+
+
+    entries: list[dict] = []
+    skipped = 0
+
+    for offset, line in _chunk_lines(path, start, end):
+        if offset >= end:
+            break
+
+        if not line.strip():
+            continue
+
+        try:
+            data = loads(line)
+        except ValueError:
+            skipped += 1
+            continue
+
+        if not isinstance(data, dict) or "message" not in data:
+            skipped += 1
+            continue
+
+        level = _parse_level(data.get("level", 1))
+
+        if level is None:
+            skipped += 1
+            continue
+
+        entries.append({
+            "time": data.get("time", ""),
+            "level": level,
+            "source": data.get("source") or source,
+            "message": data["message"],
+            "context": data.get("context", "UNKNOWN"),
+            "app_name": data.get("app_name") or app_name,
+            "exception_message": data.get("exception_message", "None"),
+            "trace": data.get("trace") or []
+        })
+
+    return entries, skipped
+
+def _parse_chunk(task: tuple[str, bool, int, int, str, str]) -> tuple[list[dict], int]:
+    path, ndjson, start, end, app_name, source = task
+
+    if ndjson:
+        return _parse_ndjson_chunk(path, start, end, app_name, source)
+
+    return _parse_text_chunk(path, start, end, app_name, source), 0
+
+#endregion
+
+#region public
+
+def import_files(paths: list[str], app_name: str, source: str, database: str|None = None, workers: int|None = None) -> tuple[int, int]:
+    """
+        Imports local log files and ndjson dumps into the dedicated log database.
+
+        Files are parsed in chunks by a process pool while the parsed chunks
+        are inserted in order, each one in a single transaction. The log server
+        must not be running on the same database.
+
+        :param paths: The files to import, local log files or ndjson dumps.
+        :param app_name: The app name of the entries not providing one.
+        :param source: The source of the entries not providing one.
+        :param database: The database file, the dedicated_log_file by default.
+        :param workers: The number of parser processes, the cpu count by default.
+
+        :return The number of imported entries and the number of skipped ndjson lines:
+
+        :raises RuntimeError: If the database is in use by a running log server.
+    """
+    from multiprocessing import Pool
+    from collections import deque
+    from os import cpu_count
+    import src.dedicated_logger as dedicated_logger
+
+
+    tasks = [
+        (path, _is_ndjson(path), start, end, app_name, source)
+        for path in paths
+        for start, end in _chunks(path)
+    ]
+
+    workers = workers or cpu_count() or 1
+    skipped = 0
+
+    def parsed_batches() -> Iterator[list[dict]]:
+        """Yields the parsed chunks in order, keeping at most two chunks per worker in memory."""
+        nonlocal skipped
+
+
+        pending = deque()
+
+        for task in tasks:
+            pending.append(pool.apply_async(_parse_chunk, (task,)))
+
+            if len(pending) >= workers * 2:
+                entries, chunk_skipped = pending.popleft().get()
+                skipped += chunk_skipped
+
+                yield entries
+
+        while pending:
+            entries, chunk_skipped = pending.popleft().get()
+            skipped += chunk_skipped
+
+            yield entries
+
+    with Pool(workers) as pool:
+        count = dedicated_logger.bulk_insert(parsed_batches(), database)
+
+    return count, skipped
+
+#endregion
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+    from time import perf_counter
+
+
+    parser = ArgumentParser(prog="python -m src.importer", description="Imports local log files and ndjson dumps into the dedicated log database.")
+    parser.add_argument("files", nargs="+", help="The local log files or ndjson dumps to import.")
+    parser.add_argument("--app-name", default="DEFAULT", help="The app name of the entries not providing one.")
+    parser.add_argument("--source", default="import", help="The source of the entries not providing one.")
+    parser.add_argument("--database", default=None, help="The database file, the dedicated_log_file by default.")
+    parser.add_argument("--workers", type=int, default=None, help="The number of parser processes, the cpu count by default.")
+
+    arguments = parser.parse_args()
+    started = perf_counter()
+
+    count, skipped = import_files(arguments.files, arguments.app_name, arguments.source, arguments.database, arguments.workers)
+    elapsed = perf_counter() - started
+
+    print(f"Imported {count} entries in {elapsed:.2f} seconds, {count / max(elapsed, 1e-9):.0f} entries per second.")
+
+    if skipped:
+        print(f"Skipped {skipped} ndjson lines that were invalid or had an unknown level.")
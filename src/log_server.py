@@ -1,4 +1,6 @@
 import src.dedicated_logger as dedicated_logger
+import src.profiler as profiler
+import src.relay as relay
 from threading import Event
 from config import *
 from logger import *
@@ -7,48 +9,233 @@ from logger import *
 #region private
 
 _start_event = Event()
+_relay_start_event = Event()
+_socket_inode: int|None = None
+
+def _dispatch(entry: dict):
+    """Stores the entry locally and/or forwards it upstream, depending on the relay configuration."""
+
+
+    if config["relay_enabled"]:
+        if config["relay_store_locally"]:
+            # The dedicated logger modifies the entry, the relay gets its own copy.
+
+            dedicated_logger.add_entry(dict(entry))
+
+        relay.add_entry(entry)
+    else:
+        dedicated_logger.add_entry(entry)
+
+def _kernel_drops(inode: int|None) -> int|None:
+    """
+        Reads the number of datagrams the kernel dropped for the socket with the provided inode.
+
+        :return The drop counter or None if it is not available on this platform:
+    """
+    if inode is None:
+        return None
+
+    try:
+        with open("/proc/net/udp", encoding="ascii") as handle:
+            next(handle)
+
+            for line in handle:
+                fields = line.split()
+
+                if len(fields) > 12 and fields[9] == str(inode):
+                    return int(fields[12])
+    except (OSError, ValueError, StopIteration):
+        pass
+
+    return None
 
 def _thread():
-    from socket import AF_INET, SOCK_DGRAM, SOL_SOCKET, SO_BROADCAST, socket as Socket, timeout as SocketTimeoutError, error as SocketError
+    from socket import AF_INET, SOCK_DGRAM, SOL_SOCKET, SO_BROADCAST, SO_RCVBUF, socket as Socket, error as SocketError
     from json import loads as json_decode
+    from time import perf_counter, monotonic
+    from codecs import utf_8_decode
+    from select import select
+    from os import fstat
+    import socket
+
+    global _socket_inode
+
+
+    # Without MSG_DONTWAIT only one datagram is received per wakeup.
+
+    dont_wait = getattr(socket, "MSG_DONTWAIT", None)
 
     try:
         socket_server = Socket(AF_INET, SOCK_DGRAM, 0)
 
+        if config["receive_buffer_size"]:
+            socket_server.setsockopt(SOL_SOCKET, SO_RCVBUF, config["receive_buffer_size"])
+
         socket_server.bind((config["host"], config["port"]))
         socket_server.setsockopt(SOL_SOCKET, SO_BROADCAST, 1)
-        socket_server.settimeout(1.0)
+
+        debug(f"Socket receive buffer size is {socket_server.getsockopt(SOL_SOCKET, SO_RCVBUF)} bytes.")
+
+        # The datagrams of a batch are received into slots of a buffer allocated once.
+
+        datagram_size = config["max_datagram_size"]
+        batch_size = config["receive_batch_size"] if dont_wait is not None else 1
+        pool = memoryview(bytearray(datagram_size * batch_size))
+        slots = [pool[index * datagram_size:(index + 1) * datagram_size] for index in range(batch_size)]
+
+        try:
+            _socket_inode = fstat(socket_server.fileno()).st_ino
+        except OSError:
+            _socket_inode = None
+
+        drops = _kernel_drops(_socket_inode)
+        drops_checked = monotonic()
 
 
         _start_event.set()
 
+        # The socket blocks until a datagram arrives, the daemon thread is dropped at exit.
+
         while True:
             try:
-                data, remote_address = socket_server.recvfrom(2048)
+                # Only datagrams already waiting are timed, idle waiting is not part of the receive stage.
+
+                ready = profiler.enabled and select([socket_server], [], [], 0)[0]
+                receiving = perf_counter()
+
+                batch = [socket_server.recvfrom_into(slots[0])]
+
+                if ready:
+                    profiler.record("receive", perf_counter() - receiving)
+
+                # Drains the datagrams already waiting in the kernel buffer.
+
+                while len(batch) < batch_size:
+                    receiving = perf_counter()
+
+                    try:
+                        batch.append(socket_server.recvfrom_into(slots[len(batch)], 0, dont_wait))
+                    except BlockingIOError:
+                        break
+
+                    if profiler.enabled:
+                        profiler.record("receive", perf_counter() - receiving)
+
+                for slot, (size, remote_address) in zip(slots, batch):
+                    decoding = perf_counter()
+
+                    try:
+                        log_data = json_decode(utf_8_decode(slot[:size], "strict", True)[0])
+                    except ValueError:
+                        log_data = None
+
+                    if not isinstance(log_data, dict) or len(log_data) < 4:
+                        warn(f"Invalid log format received: \"{bytes(slot[:size]).decode(errors='replace')}\".")
+                        continue
+
+                    log_data["source"] = remote_address[0]
 
-                log_data = json_decode(data)
+                    enqueuing = perf_counter()
 
-                if len(log_data) < 4:
-                    warn(f"Invalid log format received: \"{data.decode()}\".")
-                    continue
+                    _dispatch(log_data)
 
-                log_data["source"] = remote_address[0]
-                
-                dedicated_logger.add_entry(log_data)
-            except SocketTimeoutError:
-                pass
+                    if profiler.enabled:
+                        profiler.record("decode", enqueuing - decoding)
+                        profiler.record("enqueue", perf_counter() - enqueuing)
+
+                # The drop counter is only read while datagrams are flowing, at most once per interval.
+
+                if drops is not None and monotonic() - drops_checked >= config["drop_report_interval"]:
+                    drops_checked = monotonic()
+                    current_drops = _kernel_drops(_socket_inode)
+
+                    if current_drops is not None:
+                        if current_drops > drops:
+                            warn(f"The kernel dropped {current_drops - drops} datagrams, {current_drops} in total. Consider increasing receive_buffer_size.")
+
+                        drops = current_drops
             except SocketError as exception:
                 error("Socket exception occured", exception)
     finally:
         _start_event.set()
 
+def _relay_connection_thread(connection, remote_address):
+    """Receives the batches forwarded by a relay log server over a persistent connection."""
+
+
+    try:
+        with connection:
+            while True:
+                entries = relay.receive_batch(connection)
+
+                if entries is None:
+                    break
+
+                for log_data in entries:
+                    if not isinstance(log_data, dict) or len(log_data) < 4:
+                        warn(f"Invalid relayed log format received from {remote_address[0]}.")
+                        continue
+
+                    # Keeps the address of the client that originally sent the entry.
+
+                    log_data.setdefault("source", remote_address[0])
+
+                    _dispatch(log_data)
+
+                relay.acknowledge(connection)
+    except (OSError, ValueError) as exception:
+        warn(f"Relay connection from {remote_address[0]} closed", exception)
+
+def _relay_listener_thread():
+    from socket import AF_INET, SOCK_STREAM, SOL_SOCKET, SO_REUSEADDR, socket as Socket, error as SocketError
+    from threading import Thread
+
+
+    try:
+        listener = Socket(AF_INET, SOCK_STREAM)
+
+        listener.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
+        listener.bind((config["host"], config["port"]))
+        listener.listen()
+
+        _relay_start_event.set()
+
+        while True:
+            try:
+                connection, remote_address = listener.accept()
+
+                info(f"Accepted relay connection from {remote_address[0]}.")
+
+                Thread(target=_relay_connection_thread, args=(connection, remote_address), name="Relay Connection", daemon=True).start()
+            except SocketError as exception:
+                error("Socket exception occured", exception)
+    except Exception as exception:
+        error("Relay listener died", exception)
+    finally:
+        _relay_start_event.set()
+
 #endregion
 
 
+def dropped_datagrams() -> int|None:
+    """
+        Gets the number of datagrams dropped by the kernel, because the socket receive buffer was full.
+
+        :return The drop counter or None if it is not available on this platform:
+    """
+    return _kernel_drops(_socket_inode)
+
 def start():
     """Starts the logger server."""
     from threading import Thread
 
 
     Thread(target=_thread, name="Log Server", daemon=True).start()
-    _start_event.wait()
\ No newline at end of file
+    _start_event.wait()
+
+    if config["relay_accept"]:
+        # Relays connect over tcp, on the same host and port as the udp server.
+        # The listener is not authenticated and trusts the sources sent by relays, so it is disabled by default.
+
+        Thread(target=_relay_listener_thread, name="Relay Listener", daemon=True).start()
+        _relay_start_event.wait()
\ No newline at end of file
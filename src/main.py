@@ -1,15 +1,75 @@
-from time import sleep
+from threading import Event
+from config import *
 from logger import *
 
 import src.dedicated_logger as dedicated_logger
 import src.log_server as log_server
+import src.profiler as profiler
+import src.relay as relay
 
 
-dedicated_logger.start()
-log_server.start()
+#region private
 
-info("Started")
+def _toggle_profiler(signal_number, frame):
+    profiler.toggle()
 
+def _reload_config(signal_number, frame):
+    info("Reloading configuration.")
 
-while True:
-    sleep(1.0)
\ No newline at end of file
+    try:
+        ignored = reload_config()
+    except (OSError, ValueError) as exception:
+        error("Unable to reload configuration", exception)
+        return
+
+    if ignored:
+        warn(f"Changes to {', '.join(ignored)} only take effect after a restart.")
+
+    profiler.apply_config()
+
+#endregion
+
+#region public
+
+def run():
+    """Starts the server and blocks until interrupted."""
+    import signal
+
+
+    if not config["relay_enabled"] or config["relay_store_locally"]:
+        dedicated_logger.start()
+
+    if config["relay_enabled"]:
+        relay.start()
+
+    log_server.start()
+
+    # Signals are not available on every platform, profiling can still be enabled from the configuration.
+
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, _toggle_profiler)
+
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, _reload_config)
+
+    profiler.apply_config()
+
+    info("Started")
+
+    # Blocks without waking up until a signal, like SIGINT, interrupts the wait.
+
+    if hasattr(signal, "pause"):
+        while True:
+            signal.pause()
+    else:
+        Event().wait()
+
+def shutdown():
+    """Saves the running profile, if any, and waits for the queued entries to be stored or forwarded."""
+
+
+    profiler.stop()
+    relay.shutdown()
+    dedicated_logger.shutdown()
+
+#endregion
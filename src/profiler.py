@@ -0,0 +1,185 @@
+from threading import Event, Lock, Thread
+from collections import Counter
+from config import *
+from logger import *
+
+
+log_context("Profiler")
+
+#region private
+
+# Percentiles are computed from the first samples of each stage, only the totals are kept afterwards.
+
+_max_stage_samples = 1000000
+
+_lock = Lock()
+_stop_event = Event()
+_sampler: Thread|None = None
+_started = ""
+
+_stacks: Counter[str] = Counter()
+_stage_samples: dict[str, list[float]] = {}
+_stage_totals: dict[str, list[float]] = {}
+
+
+def _frame_name(frame) -> str:
+    from os.path import basename
+
+
+    code = frame.f_code
+
+    return f"{code.co_name} ({basename(code.co_filename)}:{code.co_firstlineno})"
+
+def _sampler_thread(interval: float):
+    from threading import enumerate as threads, get_ident
+    from sys import _current_frames
+
+
+    own_ident = get_ident()
+
+    while not _stop_event.wait(interval):
+        names = {thread.ident: thread.name for thread in threads()}
+
+        for ident, frame in _current_frames().items():
+            if ident == own_ident:
+                continue
+
+            stack = []
+
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+
+            stack.append(names.get(ident, str(ident)).replace(" ", "_"))
+            stack.reverse()
+
+            with _lock:
+                _stacks[";".join(stack)] += 1
+
+def _percentile(samples: list[float], fraction: float) -> float:
+    return samples[min(int(len(samples) * fraction), len(samples) - 1)]
+
+def _stage_report() -> str:
+    lines = [f"{'stage':<10} {'count':>10} {'mean ms':>10} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'max ms':>10} {'total s':>10}"]
+
+    for stage, (count, total, maximum) in _stage_totals.items():
+        samples = sorted(_stage_samples[stage])
+
+        lines.append(
+            f"{stage:<10} {int(count):>10} {total / count * 1000:>10.3f} "
+            f"{_percentile(samples, 0.5) * 1000:>10.3f} {_percentile(samples, 0.95) * 1000:>10.3f} "
+            f"{_percentile(samples, 0.99) * 1000:>10.3f} {maximum * 1000:>10.3f} {total:>10.3f}"
+        )
+
+    return "\n".join(lines) + "\n"
+
+def _dump():
+    from os.path import join
+    from os import makedirs
+
+
+    directory = config["profiler_directory"]
+    prefix = join(directory, f"profile-{_started}")
+
+    makedirs(directory, exist_ok=True)
+
+    with _lock:
+        with open(prefix + ".collapsed", "w", encoding="utf-8") as handle:
+            for stack, count in _stacks.items():
+                handle.write(f"{stack} {count}\n")
+
+        with open(prefix + ".stages.txt", "w", encoding="utf-8") as handle:
+            handle.write(_stage_report())
+
+    info(f"Profile saved to {prefix}.collapsed and {prefix}.stages.txt.")
+
+#endregion
+
+#region public
+
+enabled = False
+"""True while profiling, checked by the hot paths before timing their stages."""
+
+
+def start():
+    """Starts sampling the thread stacks and timing the pipeline stages."""
+    from datetime import datetime
+
+    global enabled, _sampler, _started
+
+
+    if enabled:
+        return
+
+    with _lock:
+        _stacks.clear()
+        _stage_samples.clear()
+        _stage_totals.clear()
+
+    _started = datetime.now().strftime("%Y%m%d-%H%M%S")
+    _stop_event.clear()
+    _sampler = Thread(target=_sampler_thread, args=(config["profiler_interval"],), name="Profiler", daemon=True)
+    _sampler.start()
+
+    enabled = True
+
+    info("Profiling started.")
+
+def stop():
+    """Stops profiling and saves the collapsed stacks and the stage latency report."""
+    global enabled
+
+
+    if not enabled:
+        return
+
+    enabled = False
+
+    _stop_event.set()
+    _sampler.join()
+
+    try:
+        _dump()
+    except OSError as exception:
+        error("Unable to save the profile", exception)
+
+def toggle():
+    """Starts profiling if stopped, stops it otherwise."""
+
+
+    if enabled:
+        stop()
+    else:
+        start()
+
+def apply_config():
+    """Starts or stops profiling according to the profiler_enabled configuration."""
+
+
+    if config["profiler_enabled"]:
+        start()
+    else:
+        stop()
+
+def record(stage: str, duration: float):
+    """
+        Records the duration of a pipeline stage for one entry.
+
+        :param stage: The stage name.
+        :param duration: The duration in seconds.
+    """
+    with _lock:
+        totals = _stage_totals.get(stage)
+
+        if totals is None:
+            totals = _stage_totals[stage] = [0, 0.0, 0.0]
+            _stage_samples[stage] = []
+
+        totals[0] += 1
+        totals[1] += duration
+        totals[2] = max(totals[2], duration)
+
+        if len(_stage_samples[stage]) < _max_stage_samples:
+            _stage_samples[stage].append(duration)
+
+#endregion
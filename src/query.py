@@ -0,0 +1,154 @@
+from datetime import datetime
+from typing import Iterator
+from config import *
+import src.dedicated_logger as dedicated_logger
+
+
+#region private
+
+# Rows stored with a retired template are counted under the template that replaced it, following the replacements.
+
+_template_counts_statement = """
+    with recursive current (id, current_id) as (
+        select id, id from templates where replaced_by is null
+        union all
+        select templates.id, current.current_id from templates
+            join current on templates.replaced_by = current.id
+    )
+    select templates.template, count(*) as count from logs
+        join current on current.id = logs.template_id
+        join templates on templates.id = current.current_id
+        where logs.time between :start and :end
+        group by current.current_id;
+"""
+
+_entries_statement = """
+    select logs.*, templates.template from logs
+        left join templates on templates.id = logs.template_id
+        where logs.time between :start and :end
+        order by logs.time, logs.id;
+"""
+
+_app_entries_statement = """
+    select logs.*, templates.template from logs
+        left join templates on templates.id = logs.template_id
+        where logs.time between :start and :end and logs.app_name = :app_name
+        order by logs.time, logs.id;
+"""
+
+def _format_time(time: datetime) -> str:
+    return time.strftime("%Y-%m-%d %H:%M:%S")
+
+def _shard_entries(database: str, statement: str, parameters: dict) -> Iterator[dict]:
+    """Reads the entries of a single shard, ordered by time, with their messages rendered."""
+    from sqlite3 import connect as sqlite
+    from src.templates import render
+    from json import loads
+
+
+    connection = sqlite(database)
+
+    try:
+        cursor = connection.execute(statement, parameters)
+        columns = [column[0] for column in cursor.description]
+
+        for values in cursor:
+            row = dict(zip(columns, values))
+            template = row.pop("template")
+            row_parameters = row.pop("parameters")
+
+            del row["template_id"]
+
+            if template is not None:
+                row["message"] = render(template, loads(row_parameters))
+
+            row["trace"] = loads(row["trace"]) if row["trace"] else []
+
+            yield row
+    finally:
+        connection.close()
+
+#endregion
+
+#region public
+
+def top_templates(start: datetime, end: datetime, limit: int = 10) -> list[tuple[str, int]]:
+    """
+        Gets the most frequent message templates of the log entries in the provided time range.
+
+        Every shard has its own template ids, so the counts are merged by template text.
+
+        :param start: The start of the range, inclusive.
+        :param end: The end of the range, inclusive.
+        :param limit: The maximum number of templates to return.
+
+        :return The templates and their entry counts, most frequent first:
+    """
+    from sqlite3 import connect as sqlite
+    from collections import Counter
+
+
+    parameters = {"start": _format_time(start), "end": _format_time(end)}
+    counts: Counter[str] = Counter()
+
+    for database in dedicated_logger.database_files():
+        connection = sqlite(database)
+
+        try:
+            for template, count in connection.execute(_template_counts_statement, parameters):
+                counts[template] += count
+        finally:
+            connection.close()
+
+    return counts.most_common(limit)
+
+def entries(start: datetime, end: datetime, app_name: str|None = None) -> Iterator[dict]:
+    """
+        Reads the log entries in the provided time range from every shard, merged by time.
+
+        :param start: The start of the range, inclusive.
+        :param end: The end of the range, inclusive.
+        :param app_name: Only reads the entries of this app, if provided.
+
+        :return An iterator over the entries, ordered by time:
+    """
+    from heapq import merge
+
+
+    parameters = {"start": _format_time(start), "end": _format_time(end), "app_name": app_name}
+    statement = _entries_statement if app_name is None else _app_entries_statement
+
+    return merge(
+        *(_shard_entries(database, statement, parameters) for database in dedicated_logger.database_files()),
+        key=lambda row: row["time"]
+    )
+
+#endregion
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+    from json import dumps
+
+
+    parser = ArgumentParser(prog="python -m src.query", description="Queries the dedicated log databases of every shard.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    top_parser = commands.add_parser("top", help="Prints the most frequent message templates.")
+    top_parser.add_argument("start", type=datetime.fromisoformat, help="The start of the range, for example 2024-01-31T12:00:00.")
+    top_parser.add_argument("end", type=datetime.fromisoformat, help="The end of the range.")
+    top_parser.add_argument("--limit", type=int, default=10, help="The maximum number of templates.")
+
+    entries_parser = commands.add_parser("entries", help="Prints the log entries as ndjson, ordered by time.")
+    entries_parser.add_argument("start", type=datetime.fromisoformat, help="The start of the range, for example 2024-01-31T12:00:00.")
+    entries_parser.add_argument("end", type=datetime.fromisoformat, help="The end of the range.")
+    entries_parser.add_argument("--app-name", default=None, help="Only prints the entries of this app.")
+
+    arguments = parser.parse_args()
+
+    if arguments.command == "top":
+        for template, count in top_templates(arguments.start, arguments.end, arguments.limit):
+            print(f"{count:>10} {template}")
+    else:
+        for row in entries(arguments.start, arguments.end, arguments.app_name):
+            print(dumps(row, separators=(",", ":")))
@@ -0,0 +1,245 @@
+from socket import socket as Socket
+from threading import Condition, Event, Thread
+from collections import deque
+from config import *
+from logger import *
+
+
+log_context("Relay")
+
+#region private
+
+_ack = b"\x01"
+_header_size = 4
+_max_batch_size = 64 * 1024 * 1024
+_max_decompressed_size = 256 * 1024 * 1024
+
+_start_event = Event()
+_shutdown_event = Event()
+_buffer: deque[dict] = deque()
+_buffer_condition = Condition()
+_dropped = 0
+_relay_thread: Thread|None = None
+
+
+def _receive_exactly(connection: Socket, size: int) -> bytes|None:
+    """
+        Receives exactly size bytes from the connection.
+
+        :return The received bytes or None if the connection was closed before the first byte:
+
+        :raises ConnectionError: If the connection is closed midway.
+    """
+    chunks = []
+    remaining = size
+
+    while remaining > 0:
+        chunk = connection.recv(remaining)
+
+        if not chunk:
+            if remaining == size:
+                return None
+
+            raise ConnectionError("Connection closed in the middle of a batch.")
+
+        chunks.append(chunk)
+        remaining -= len(chunk)
+
+    return b"".join(chunks)
+
+def _take_batch() -> list[dict]|None:
+    """
+        Waits for buffered entries and takes up to relay_batch_size of them.
+
+        :return The batch or None if the relay is shutting down and the buffer is empty:
+    """
+    with _buffer_condition:
+        while not _buffer and not _shutdown_event.is_set():
+            _buffer_condition.wait()
+
+        if not _buffer:
+            return None
+
+        count = min(len(_buffer), config["relay_batch_size"])
+
+        return [_buffer.popleft() for _ in range(count)]
+
+def _thread():
+    from socket import create_connection
+
+
+    connection: Socket|None = None
+    batch: list[dict]|None = None
+    frame = b""
+
+    try:
+        _start_event.set()
+
+        while True:
+            # The batch is only replaced once the upstream server acknowledged it.
+
+            if batch is None:
+                batch = _take_batch()
+
+                if batch is None:
+                    break
+
+                frame = encode_batch(batch)
+
+            try:
+                if connection is None:
+                    connection = create_connection((config["relay_host"], config["relay_port"]), timeout=config["relay_timeout"])
+
+                    info(f"Connected to upstream log server {config['relay_host']}:{config['relay_port']}.")
+
+                connection.sendall(frame)
+
+                if _receive_exactly(connection, len(_ack)) != _ack:
+                    raise ConnectionError("Upstream log server did not acknowledge the batch.")
+
+                batch = None
+            except OSError as exception:
+                if connection is not None:
+                    connection.close()
+                    connection = None
+
+                if _shutdown_event.is_set():
+                    with _buffer_condition:
+                        lost = len(batch) + len(_buffer)
+
+                    error(f"Unable to forward log entries while shutting down, {lost} entries were lost", exception)
+                    break
+
+                warn(f"Unable to forward log entries, retrying in {config['relay_retry_delay']} seconds", exception)
+
+                _shutdown_event.wait(config["relay_retry_delay"])
+    except Exception as exception:
+        error("Thread died", exception)
+    finally:
+        _start_event.set()
+
+        if connection is not None:
+            connection.close()
+
+#endregion
+
+#region public
+
+def encode_batch(entries: list[dict]) -> bytes:
+    """
+        Encodes log entries into a relay frame.
+
+        A frame is the big endian length of the payload followed by the payload,
+        the zlib compressed json array of the entries.
+    """
+    from json import dumps
+    from zlib import compress
+
+
+    payload = compress(dumps(entries, separators=(",", ":")).encode())
+
+    return len(payload).to_bytes(_header_size, "big") + payload
+
+def receive_batch(connection: Socket) -> list[dict]|None:
+    """
+        Receives a relay frame and decodes its entries.
+
+        :return The entries or None if the connection was closed:
+
+        :raises ConnectionError: If the connection is closed midway.
+        :raises ValueError: If the frame is invalid.
+    """
+    from json import loads
+    from zlib import decompressobj, error as ZlibError
+
+
+    header = _receive_exactly(connection, _header_size)
+
+    if header is None:
+        return None
+
+    size = int.from_bytes(header, "big")
+
+    if size > _max_batch_size:
+        raise ValueError(f"Relay batch of {size} bytes exceeds the maximum size.")
+
+    payload = _receive_exactly(connection, size)
+
+    if payload is None:
+        raise ConnectionError("Connection closed in the middle of a batch.")
+
+    # The decompressed size is bounded, so a small frame cannot expand into an unbounded allocation.
+
+    decompressor = decompressobj()
+
+    try:
+        data = decompressor.decompress(payload, _max_decompressed_size)
+    except ZlibError as exception:
+        raise ValueError("Invalid relay batch compression.") from exception
+
+    if decompressor.unconsumed_tail:
+        raise ValueError(f"Relay batch exceeds {_max_decompressed_size} bytes once decompressed.")
+
+    if not decompressor.eof:
+        raise ValueError("Relay batch compression is truncated.")
+
+    entries = loads(data)
+
+    if not isinstance(entries, list):
+        raise ValueError("Relay batch is not a list of entries.")
+
+    return entries
+
+def acknowledge(connection: Socket):
+    """Acknowledges the last received relay frame."""
+
+
+    connection.sendall(_ack)
+
+def start():
+    """Starts the relay thread, forwarding the added entries to the upstream log server."""
+    global _relay_thread, _buffer
+
+
+    # Sized from the configuration when starting, importing the module does not read it.
+
+    _buffer = deque(maxlen=config["relay_buffer_size"])
+
+    _relay_thread = Thread(target=_thread, name="Relay", daemon=False)
+    _relay_thread.start()
+
+    _start_event.wait()
+
+def shutdown():
+    """Makes the relay thread exit once the buffer has been forwarded and waits for it."""
+
+
+    if _relay_thread is None:
+        return
+
+    with _buffer_condition:
+        _shutdown_event.set()
+        _buffer_condition.notify()
+
+    _relay_thread.join()
+
+def add_entry(entry: dict):
+    """
+        Adds the provided log entry to the relay buffer.
+
+        The oldest buffered entry is dropped if the buffer is full.
+    """
+    global _dropped
+
+
+    with _buffer_condition:
+        if len(_buffer) == _buffer.maxlen:
+            _dropped += 1
+
+            if _dropped == 1 or _dropped % 1000 == 0:
+                warn(f"Relay buffer is full, {_dropped} entries were dropped so far.")
+
+        _buffer.append(entry)
+        _buffer_condition.notify()
+
+#endregion
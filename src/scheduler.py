@@ -0,0 +1,107 @@
+from heapq import heappush, heappop
+from typing import Callable
+from time import monotonic
+
+
+#region private
+
+def _seconds_until(clock_time: str) -> float:
+    """
+        Gets the number of seconds until the next occurrence of the provided wall clock time.
+
+        :param clock_time: The time of day in the "HH:MM" or "HH:MM:SS" format.
+    """
+    from datetime import datetime, timedelta
+
+
+    parts = [int(part) for part in clock_time.split(":")]
+
+    if len(parts) == 2:
+        parts.append(0)
+
+    if len(parts) != 3:
+        raise ValueError(f"Invalid time of day: \"{clock_time}\".")
+
+    now = datetime.now()
+    target = now.replace(hour=parts[0], minute=parts[1], second=parts[2], microsecond=0)
+
+    if target <= now:
+        target += timedelta(days=1)
+
+    return (target - now).total_seconds()
+
+#endregion
+
+#region public
+
+class Scheduler:
+    """
+        A minimal task scheduler backed by a heap of deadlines.
+
+        The scheduler never sleeps or spawns threads by itself. The owning thread
+        asks it for the time left until the next deadline, blocks on its own work
+        queue for at most that long and then calls run_pending.
+
+        It is not thread safe and must only be used from the thread that owns it.
+    """
+
+    def __init__(self):
+        self._tasks: list[tuple[float, int, Callable[[], None], Callable[[], float|None]]] = []
+        self._counter = 0
+
+    def _push(self, delay: float, task: Callable[[], None], next_delay: Callable[[], float|None]):
+        # The counter keeps the heap ordering stable and avoids comparing callables.
+
+        self._counter += 1
+        heappush(self._tasks, (monotonic() + delay, self._counter, task, next_delay))
+
+    def call_later(self, delay: float, task: Callable[[], None]):
+        """
+            Runs the task once, after the provided delay.
+
+            :param delay: The delay in seconds.
+            :param task: The function to run.
+        """
+        self._push(delay, task, lambda: None)
+
+    def daily_at(self, clock_time: str, task: Callable[[], None]):
+        """
+            Runs the task every day at the provided wall clock time.
+
+            :param clock_time: The time of day in the "HH:MM" or "HH:MM:SS" format.
+            :param task: The function to run.
+
+            :raises ValueError: If the time of day is invalid.
+        """
+        self._push(_seconds_until(clock_time), task, lambda: _seconds_until(clock_time))
+
+    def timeout(self) -> float|None:
+        """
+            Gets the number of seconds until the next task is due.
+
+            :return The number of seconds, 0 if a task is already due or None if there are no tasks:
+        """
+        if not self._tasks:
+            return None
+
+        return max(0.0, self._tasks[0][0] - monotonic())
+
+    def run_pending(self):
+        """
+            Runs all the tasks that are due and reschedules the recurring ones.
+
+            Tasks are rescheduled before being run, so a task raising an exception
+            is not lost. The exception is propagated to the caller.
+        """
+        now = monotonic()
+
+        while self._tasks and self._tasks[0][0] <= now:
+            _, _, task, next_delay = heappop(self._tasks)
+            delay = next_delay()
+
+            if delay is not None:
+                self._push(delay, task, next_delay)
+
+            task()
+
+#endregion
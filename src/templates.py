@@ -0,0 +1,151 @@
+from typing import Callable
+
+
+#region private
+
+_wildcard = "<*>"
+
+
+class _Cluster:
+    """A group of messages sharing the same template."""
+
+    __slots__ = ("tokens", "template_id")
+
+    def __init__(self, tokens: list[str], template_id: int):
+        self.tokens = tokens
+        self.template_id = template_id
+
+def _tokenize(message: str) -> list[str]:
+    # Splitting on single spaces is lossless, the message is rendered back by joining with spaces.
+
+    return message.split(" ")
+
+def _has_digits(token: str) -> bool:
+    return any(character.isdigit() for character in token)
+
+#endregion
+
+#region public
+
+class TemplateMiner:
+    """
+        An online log template miner based on the Drain fixed depth parse tree.
+
+        Messages are routed by their token count and their first tokens to a leaf
+        holding a few clusters, then matched against the most similar cluster.
+        Tokens differing from the cluster template become wildcards and are
+        returned as the message parameters.
+
+        Stored templates are never modified. When a cluster template gets more
+        general, the store callback is asked for a new template id, so the rows
+        saved with the previous id can still be rendered.
+
+        It is not thread safe and must only be used from the thread that owns it.
+    """
+
+    def __init__(
+            self,
+            store_template: Callable[[str, int|None], int],
+            depth: int = 4,
+            similarity: float = 0.4,
+            max_children: int = 100
+        ):
+        """
+            :param store_template: Called with the template text and the id of the template it replaces, if any.
+            It must return the id of the stored template.
+            :param depth: The depth of the parse tree, including the root and the token count layers.
+            :param similarity: The minimum fraction of matching tokens for a message to join a cluster.
+            :param max_children: The maximum number of children of a tree node, the other tokens share a wildcard child.
+        """
+        self._store_template = store_template
+        self._prefix_length = max(depth - 2, 1)
+        self._similarity = similarity
+        self._max_children = max_children
+        self._root: dict[int, dict] = {}
+
+    def _leaf(self, tokens: list[str]) -> list[_Cluster]:
+        """Walks the parse tree down to the leaf for the provided tokens, creating the missing nodes."""
+
+
+        node = self._root.setdefault(len(tokens), {})
+
+        for token in tokens[:self._prefix_length]:
+            if _has_digits(token):
+                token = _wildcard
+
+            if token not in node:
+                if len(node) >= self._max_children:
+                    token = _wildcard
+
+                node = node.setdefault(token, {})
+            else:
+                node = node[token]
+
+        return node.setdefault(None, [])
+
+    def load(self, template_id: int, template: str):
+        """
+            Adds an already stored template to the parse tree.
+
+            :param template_id: The id of the stored template.
+            :param template: The template text.
+        """
+        tokens = _tokenize(template)
+
+        self._leaf(tokens).append(_Cluster(tokens, template_id))
+
+    def add(self, message: str) -> tuple[int, list[str]]:
+        """
+            Matches the message against the known templates, learning a new one if needed.
+
+            :param message: The log message.
+
+            :return The template id and the message parameters:
+        """
+        tokens = _tokenize(message)
+        clusters = self._leaf(tokens)
+
+        best: _Cluster|None = None
+        best_similarity = -1.0
+
+        for cluster in clusters:
+            matches = sum(1 for template_token, token in zip(cluster.tokens, tokens) if template_token == token)
+            similarity = matches / len(tokens)
+
+            if similarity > best_similarity:
+                best = cluster
+                best_similarity = similarity
+
+        if best is None or best_similarity < self._similarity:
+            # Literal wildcard tokens are kept as parameters, so rendering stays unambiguous.
+
+            best = _Cluster(tokens, 0)
+            best.template_id = self._store_template(" ".join(tokens), None)
+
+            clusters.append(best)
+        else:
+            merged = [
+                template_token if template_token == token and token != _wildcard else _wildcard
+                for template_token, token in zip(best.tokens, tokens)
+            ]
+
+            if merged != best.tokens:
+                best.template_id = self._store_template(" ".join(merged), best.template_id)
+                best.tokens = merged
+
+        parameters = [token for template_token, token in zip(best.tokens, tokens) if template_token == _wildcard]
+
+        return best.template_id, parameters
+
+def render(template: str, parameters: list[str]) -> str:
+    """
+        Rebuilds a message from its template and parameters.
+
+        :param template: The template text.
+        :param parameters: The message parameters, in order.
+    """
+    values = iter(parameters)
+
+    return " ".join(next(values, token) if token == _wildcard else token for token in _tokenize(template))
+
+#endregion
@@ -1,5 +1,5 @@
 from os.path import dirname, abspath
-from logger import configure_logger
+from logger import configure_logger, shutdown as shutdown_logger
 from logger import *
 from os import chdir
 
@@ -9,6 +9,8 @@ from os import chdir
 chdir(dirname(abspath(__file__)))
 
 
+main = None
+
 try:
     from config import config
 
@@ -22,10 +24,19 @@ try:
     
     info("Starting up")
 
-    import src.main as _
+    import src.main as main
+
+    main.run()
 except KeyboardInterrupt:
     pass
 except BaseException as exception:
     realtime("Application crashed", exception)
 finally:
-    info("Shutting down")
\ No newline at end of file
+    info("Shutting down")
+
+    # The server threads are stopped first, so their last logs are still saved.
+
+    if main is not None:
+        main.shutdown()
+
+    shutdown_logger()
@@ -0,0 +1,134 @@
+from unittest import TestCase, main
+
+
+#region private
+
+_row_count = 3000
+_block_size = 2048
+
+
+def _rows() -> list[dict]:
+    """Rows spread over three days, one every 80 seconds."""
+    from datetime import datetime, timedelta
+
+
+    start = datetime(2026, 10, 1)
+
+    return [
+        {
+            "id": index,
+            "time": (start + timedelta(seconds=index * 80)).strftime("%Y-%m-%d %H:%M:%S"),
+            "level": index % 5,
+            "source": "127.0.0.1",
+            "message": f"Archived entry {index}",
+            "context": "TEST",
+            "app_name": "App",
+            "exception_message": "None",
+            "trace": "[]" if index % 2 else '[{"file":"app.py","line":1,"text":"run()"}]'
+        }
+        for index in range(_row_count)
+    ]
+
+#endregion
+
+
+class ArchiveTest(TestCase):
+    """Exports rows into small blocks and reads time ranges back by seeking to the indexed blocks."""
+
+    def setUp(self):
+        from tempfile import TemporaryDirectory
+        from config import config
+
+
+        self._directory = TemporaryDirectory()
+        self._config = dict(config)
+
+        config["dedicated_log_archive_directory"] = self._directory.name
+        config["dedicated_log_archive_block_size"] = _block_size
+
+    def tearDown(self):
+        from config import config
+
+
+        config.clear()
+        config.update(self._config)
+
+        self._directory.cleanup()
+
+    def test_query_reads_ranges_across_blocks(self):
+        from datetime import datetime
+        from json import loads
+        import src.archive as archive
+
+
+        rows = _rows()
+        expected = [dict(row, trace=loads(row["trace"])) for row in rows]
+
+        self.assertEqual(archive.export(dict(row) for row in rows), _row_count)
+
+        ranges = [
+            (datetime(2026, 10, 1), datetime(2026, 10, 4)),
+            (datetime(2026, 10, 1, 5, 17, 3), datetime(2026, 10, 1, 9, 0)),
+            (datetime(2026, 10, 1, 23, 30), datetime(2026, 10, 2, 0, 30)),
+            (datetime(2026, 10, 3, 12, 0), datetime(2026, 10, 3, 12, 0, 59))
+        ]
+
+        for start, end in ranges:
+            in_range = [row for row in expected if start <= archive.parse_time(row["time"]) <= end]
+
+            self.assertEqual(list(archive.query(start, end)), in_range)
+
+    def test_blocks_decompress_independently(self):
+        from gzip import decompress
+        from os.path import join
+        import src.archive as archive
+
+
+        archive.export(_rows())
+
+        index = archive._read_index(join(self._directory.name, "2026-10-02.index.ndjson"))
+
+        self.assertGreater(len(index), 10)
+
+        with open(join(self._directory.name, "2026-10-02.ndjson.gz"), "rb") as handle:
+            data = handle.read()
+
+        offset = 0
+
+        for entry in index:
+            self.assertEqual(entry["offset"], offset)
+            self.assertEqual(len(decompress(data[entry["offset"]:entry["offset"] + entry["length"]]).splitlines()), entry["count"])
+
+            offset += entry["length"]
+
+        self.assertEqual(offset, len(data))
+
+        # The whole segment is also a valid multi member gzip file.
+
+        self.assertEqual(len(decompress(data).splitlines()), sum(entry["count"] for entry in index))
+
+    def test_torn_index_line_is_dropped(self):
+        from datetime import datetime
+        from os.path import join
+        import src.archive as archive
+
+
+        rows = _rows()[:100]
+
+        archive.export(dict(row) for row in rows[:50])
+
+        with open(join(self._directory.name, "2026-10-01.index.ndjson"), "a", encoding="utf-8") as handle:
+            handle.write('{"offset":')
+
+        with open(join(self._directory.name, "2026-10-01.ndjson.gz"), "ab") as handle:
+            handle.write(b"unindexed block")
+
+        self.assertEqual(len(list(archive.query(datetime(2026, 10, 1), datetime(2026, 10, 2)))), 50)
+
+        archive.export(dict(row) for row in rows[50:])
+
+        self.assertEqual([row["id"] for row in archive.query(datetime(2026, 10, 1), datetime(2026, 10, 2))], list(range(100)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+from unittest import TestCase, main
+
+
+#region private
+
+_entry_count = 3000
+_chunk_size = 4096
+
+
+def _write_log(path: str) -> list[dict]:
+    """Writes a local log file as the logger does and returns the entries the importer should read from it."""
+    from logger import _get_log_text, _level_to_string
+
+
+    expected = []
+
+    with open(path, "w", encoding="utf-8") as handle:
+        for index in range(_entry_count):
+            level = index % len(_level_to_string)
+            message = f"Entry {index}" if index % 3 else f"Entry {index}\nspanning\nthree lines"
+            exception = ValueError(f"Invalid value {index}\nsecond line") if index % 4 == 0 else None
+            trace = [
+                {"file": f"/app/module_{frame}.py", "line": index + frame, "text": f"call_{frame}()"}
+                for frame in range(index % 3 + 1)
+            ]
+
+            log_entry = {
+                "level": level,
+                "message": message,
+                "exception": exception,
+                "trace": trace,
+                "context": "TEST",
+                "time": "19.10.2026 10:00:00"
+            }
+
+            handle.write(_get_log_text(log_entry) + "\n")
+
+            expected.append({
+                "time": "19.10.2026 10:00:00",
+                "level": level,
+                "message": message,
+                "context": "TEST",
+                "exception_message": str(exception),
+                "trace": [
+                    {"file": frame["file"].rsplit("/", 1)[1], "line": frame["line"], "text": frame["text"]}
+                    for frame in trace
+                ] if level >= 3 else []
+            })
+
+    return expected
+
+#endregion
+
+
+class TextChunkTest(TestCase):
+    """Parses a local log file split into small chunks, so many entries cross a chunk boundary."""
+
+    def setUp(self):
+        from tempfile import TemporaryDirectory
+        import src.importer as importer
+
+
+        self._directory = TemporaryDirectory()
+        self._chunk_size = importer._chunk_size
+
+        importer._chunk_size = _chunk_size
+
+    def tearDown(self):
+        import src.importer as importer
+
+
+        importer._chunk_size = self._chunk_size
+
+        self._directory.cleanup()
+
+    def test_chunks_round_trip(self):
+        from os.path import join
+        import src.importer as importer
+
+
+        path = join(self._directory.name, "local.log")
+        expected = _write_log(path)
+        chunks = importer._chunks(path)
+
+        self.assertGreater(len(chunks), 50)
+
+        entries = []
+
+        for start, end in chunks:
+            chunk_entries, skipped = importer._parse_chunk((path, False, start, end, "App", "import"))
+
+            self.assertEqual(skipped, 0)
+
+            entries += chunk_entries
+
+        self.assertEqual(len(entries), len(expected))
+
+        for entry, expected_entry in zip(entries, expected):
+            self.assertEqual(entry["app_name"], "App")
+            self.assertEqual(entry["source"], "import")
+            self.assertEqual({key: entry[key] for key in expected_entry}, expected_entry)
+
+class NdjsonChunkTest(TestCase):
+    """Parses ndjson dumps, skipping the lines that cannot be imported."""
+
+    def test_unknown_levels_are_skipped(self):
+        from tempfile import TemporaryDirectory
+        from os.path import join
+        from json import dumps
+        import src.importer as importer
+
+
+        lines = [
+            dumps({"time": "19.10.2026 10:00:00", "level": "ERROR", "message": "named"}),
+            dumps({"time": "19.10.2026 10:00:00", "level": 2, "message": "numbered"}),
+            dumps({"time": "19.10.2026 10:00:00", "level": "WARN", "message": "unknown"}),
+            dumps({"time": "19.10.2026 10:00:00", "level": 9, "message": "out of range"}),
+            "not json"
+        ]
+
+        with TemporaryDirectory() as directory:
+            path = join(directory, "dump.ndjson")
+
+            with open(path, "w", encoding="utf-8") as handle:
+                handle.write("\n".join(lines) + "\n")
+
+            entries, skipped = importer._parse_chunk((path, True, 0, 1 << 20, "App", "import"))
+
+        self.assertEqual([(entry["message"], entry["level"]) for entry in entries], [("named", 3), ("numbered", 2)])
+        self.assertEqual(skipped, 3)
+
+
+if __name__ == "__main__":
+    main()
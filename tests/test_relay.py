@@ -0,0 +1,208 @@
+from os.path import dirname, abspath
+from unittest import TestCase, main
+from subprocess import Popen
+from typing import Any
+
+
+#region private
+
+_root = dirname(dirname(abspath(__file__)))
+_entry_count = 50
+
+# Entries are sent from a loopback address other than the one the upstream server sees the relay connect from.
+
+_client_address = "127.0.0.2"
+
+
+def _free_port() -> int:
+    """Gets a port free for both udp and tcp, servers use the same port for both."""
+    from socket import socket, SOCK_DGRAM, SOCK_STREAM
+
+
+    while True:
+        with socket(type=SOCK_STREAM) as tcp:
+            tcp.bind(("127.0.0.1", 0))
+            port = tcp.getsockname()[1]
+
+            try:
+                with socket(type=SOCK_DGRAM) as udp:
+                    udp.bind(("127.0.0.1", port))
+            except OSError:
+                continue
+
+            return port
+
+def _server_config(directory: str, name: str, **overrides: Any) -> str:
+    """Writes the configuration of a test server, based on the default one, and returns its path."""
+    from os.path import join
+    from json import load, dump
+
+
+    with open(join(_root, "files", "config.json")) as handle:
+        config = load(handle)
+
+    config.update({
+        "local_log_file": join(directory, f"{name}.log"),
+        "dedicated_log_file": join(directory, f"{name}.sqlite"),
+        "dedicated_log_sharding": "none",
+        "dedicated_log_archive_directory": join(directory, f"{name}-archive"),
+        "dedicated_log_templates": False,
+        "profiler_enabled": False
+    })
+    config.update(overrides)
+
+    path = join(directory, f"{name}.json")
+
+    with open(path, "w") as handle:
+        dump(config, handle)
+
+    return path
+
+def _start_server(config_path: str) -> Popen:
+    from subprocess import DEVNULL
+    from os import environ
+    from sys import executable
+
+
+    return Popen(
+        [executable, "startup.py"],
+        cwd=_root,
+        env={**environ, "LOG_SERVER_CONFIG": config_path},
+        stdout=DEVNULL,
+        stderr=DEVNULL
+    )
+
+def _wait_started(process: Popen, log_file: str, timeout: float = 10.0):
+    """Waits for the server to log that it started."""
+    from time import monotonic, sleep
+
+
+    deadline = monotonic() + timeout
+
+    while monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode} while starting.")
+
+        try:
+            with open(log_file, encoding="utf-8") as handle:
+                if "[INFO]: Started" in handle.read():
+                    return
+        except FileNotFoundError:
+            pass
+
+        sleep(0.05)
+
+    raise TimeoutError("Server did not start in time.")
+
+def _stop_server(process: Popen, timeout: float = 10.0) -> int:
+    from signal import SIGINT
+
+
+    if process.poll() is None:
+        process.send_signal(SIGINT)
+
+    try:
+        return process.wait(timeout)
+    except Exception:
+        process.kill()
+        raise
+
+#endregion
+
+
+class RelayLoopbackTest(TestCase):
+    """Forwards entries through a relay to an upstream server, both running locally."""
+
+    def setUp(self):
+        from tempfile import TemporaryDirectory
+        from socket import socket, SOCK_DGRAM
+
+
+        try:
+            with socket(type=SOCK_DGRAM) as probe:
+                probe.bind((_client_address, 0))
+        except OSError:
+            self.skipTest(f"{_client_address} is not a loopback address on this platform.")
+
+        self._directory = TemporaryDirectory()
+        self._processes: list[Popen] = []
+
+    def tearDown(self):
+        for process in self._processes:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+
+        self._directory.cleanup()
+
+    def test_entries_reach_upstream_with_original_source(self):
+        from socket import socket, SOCK_DGRAM
+        from datetime import datetime
+        from sqlite3 import connect
+        from time import sleep
+        from os.path import join
+        from json import dumps
+
+
+        directory = self._directory.name
+        upstream_port = _free_port()
+        relay_port = _free_port()
+
+        upstream_config = _server_config(directory, "upstream", port=upstream_port, relay_accept=True, relay_enabled=False)
+        relay_config = _server_config(
+            directory, "relay",
+            port=relay_port,
+            relay_accept=False,
+            relay_enabled=True,
+            relay_store_locally=False,
+            relay_host="127.0.0.1",
+            relay_port=upstream_port
+        )
+
+        upstream = _start_server(upstream_config)
+        self._processes.append(upstream)
+        _wait_started(upstream, join(directory, "upstream.log"))
+
+        relay = _start_server(relay_config)
+        self._processes.append(relay)
+        _wait_started(relay, join(directory, "relay.log"))
+
+        time = datetime.now().strftime("%d.%m.%Y %H:%M:%S")
+
+        with socket(type=SOCK_DGRAM) as client:
+            client.bind((_client_address, 0))
+
+            for index in range(_entry_count):
+                entry = {
+                    "time": time,
+                    "level": 1,
+                    "message": f"Relayed entry {index}",
+                    "context": "TEST",
+                    "app_name": "Relay Test",
+                    "exception_message": "None",
+                    "trace": []
+                }
+
+                client.sendto(dumps(entry).encode(), ("127.0.0.1", relay_port))
+
+        # Gives the relay time to read the datagrams, it forwards its buffer and the upstream server stores its queue before exiting.
+
+        sleep(0.5)
+
+        self.assertEqual(_stop_server(relay), 0)
+        self.assertEqual(_stop_server(upstream), 0)
+
+        connection = connect(join(directory, "upstream.sqlite"))
+
+        try:
+            rows = connection.execute("select message, source, app_name from logs where context = 'TEST'").fetchall()
+        finally:
+            connection.close()
+
+        self.assertEqual(sorted(message for message, _, _ in rows), sorted(f"Relayed entry {index}" for index in range(_entry_count)))
+        self.assertEqual({source for _, source, _ in rows}, {_client_address})
+        self.assertEqual({app_name for _, _, app_name in rows}, {"Relay Test"})
+
+
+if __name__ == "__main__":
+    main()
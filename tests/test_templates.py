@@ -0,0 +1,88 @@
+from unittest import TestCase, main
+
+
+#region private
+
+def _messages() -> list[str]:
+    """Messages sharing a few templates, with varying parameters, spacing and literal wildcards."""
+
+
+    messages = []
+
+    for index in range(2000):
+        messages += [
+            f"user {index} timed out after {index % 7} retries",
+            f"Connected to 10.0.{index % 5}.{index % 250} on port {60000 + index}",
+            f"cache {'hit' if index % 2 else 'miss'} for key session:{index}",
+            f"request  with  double  spaces {index}",
+            f"literal <*> token {index}",
+            "" if index % 100 == 0 else f"job {index % 13} finished in {index}ms"
+        ]
+
+    return messages
+
+#endregion
+
+
+class TemplateMinerTest(TestCase):
+    """Mines templates and renders every message back from its template and parameters."""
+
+    def setUp(self):
+        self._templates: dict[int, str] = {}
+        self._replaced: dict[int, int] = {}
+
+    def _store_template(self, template: str, replaced_id: int|None) -> int:
+        # Stored templates are immutable, like in the templates table.
+
+        template_id = len(self._templates) + 1
+        self._templates[template_id] = template
+
+        if replaced_id is not None:
+            self._replaced[replaced_id] = template_id
+
+        return template_id
+
+    def test_messages_round_trip(self):
+        from src.templates import TemplateMiner, render
+
+
+        miner = TemplateMiner(self._store_template)
+
+        for message in _messages():
+            template_id, parameters = miner.add(message)
+
+            self.assertEqual(render(self._templates[template_id], parameters), message)
+
+        # The similar messages were merged, instead of getting a template each.
+
+        self.assertLess(len(self._templates), 100)
+        self.assertTrue(self._replaced)
+
+    def test_loaded_templates_are_reused(self):
+        from src.templates import TemplateMiner, render
+
+
+        miner = TemplateMiner(self._store_template)
+
+        for message in _messages()[:600]:
+            miner.add(message)
+
+        replaced = set(self._replaced)
+        active = {template_id: template for template_id, template in self._templates.items() if template_id not in replaced}
+        count = len(self._templates)
+
+        loaded = TemplateMiner(self._store_template)
+
+        for template_id, template in active.items():
+            loaded.load(template_id, template)
+
+        for message in _messages()[:600]:
+            template_id, parameters = loaded.add(message)
+
+            self.assertEqual(render(self._templates[template_id], parameters), message)
+
+        self.assertEqual(len(self._templates), count)
+
+
+if __name__ == "__main__":
+    main()